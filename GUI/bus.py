@@ -0,0 +1,240 @@
+import os
+import time
+import cv2 as cv
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+"""Shared-memory frame bus between the radar, camera and GUI processes
+
+Every channel is one shared memory block with a small header and a ring of fixed-layout
+slots (numpy structured arrays), so camera images, radar point columns and fused objects
+are written once by the producer and read in place by any number of consumers.
+
+There are no locks, slots are handed over with sequence numbers (seqlock):
+the producer marks the slot odd while writing, writes the payload, marks it with the
+even sequence number of the frame and publishes the frame counter in the header.
+A consumer reads the counter, uses the slot and checks the slot sequence afterwards,
+a changed sequence means the producer lapped the ring and the data must be dropped.
+One producer per channel.
+
+Usage:
+    bus = FrameBus('fusion', create = True)       # owner, e.g. GUI
+    bus = FrameBus('fusion')                      # producers and other consumers
+    bus['radar'].write(count = n, x = x, y = y)   # columns are filled up to count
+    frame = bus['radar'].latest()                 # (seq, slot copy) or None
+"""
+
+# header of every channel: frame counter, slot count, slot size
+HEADER_DTYPE = np.dtype([('counter', '<u8'), ('slots', '<u8'), ('itemsize', '<u8')])
+
+def camera_dtype(width : int = 800, height : int = 600) -> np.dtype:
+    # one BGR image with its grab time and camera sequence number
+    return np.dtype([('seq', '<u8'), ('stamp', '<f8'), ('number', '<i8'), ('height', '<u4'), ('width', '<u4'),
+                     ('image', 'u1', (height, width, 3))])
+
+def radar_dtype(max_points : int = 512) -> np.dtype:
+    # point cloud columns of one radar frame, valid up to count
+    return np.dtype([('seq', '<u8'), ('stamp', '<f8'), ('number', '<u4'), ('count', '<u4'),
+                     ('x', '<f4', max_points), ('y', '<f4', max_points), ('z', '<f4', max_points),
+                     ('doppler', '<f4', max_points), ('snr', '<f4', max_points)])
+
+def fused_dtype(max_objects : int = 64) -> np.dtype:
+    # fused objects (see Kamera/fusion.FUSED_DTYPE), valid up to count
+    return np.dtype([('seq', '<u8'), ('stamp', '<f8'), ('camera', '<i8'), ('radar', '<i8'), ('count', '<u4'),
+                     ('boxes', '<f4', (max_objects, 6)), ('points', '<i4', max_objects),
+                     ('range', '<f4', max_objects), ('velocity', '<f4', max_objects)])
+
+# set on the first attach: True if this process has its own resource tracker
+_private_tracker = None
+
+def _attach(name : str) -> shared_memory.SharedMemory:
+    # consumers must not unlink the block when they exit
+    global _private_tracker
+    try:
+        return shared_memory.SharedMemory(name, track = False)
+    except TypeError:
+        pass
+    # python < 3.13 registers every attached block with the resource tracker on posix, a tracker
+    # inherited from the owner process is fine, an own tracker would unlink it at exit
+    # (windows has no tracker for shared memory, unregister would try to start one and fail)
+    if _private_tracker is None:
+        _private_tracker = os.name == 'posix' and getattr(resource_tracker._resource_tracker, '_fd', None) is None
+    shm = shared_memory.SharedMemory(name)
+    if _private_tracker: resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+class Channel():
+    """Ring of fixed-layout slots in one shared memory block
+    @param name : name of the shared memory block
+    @param dtype : slot layout, the first field must be 'seq' (u8)
+    @param slots : ring size, a consumer may hold a slot for slots - 1 frames
+    @param create : True for the owner (creates and unlinks the block)
+    """
+    def __init__(self, name : str, dtype : np.dtype, slots : int = 4, create : bool = False):
+        self.name = name
+        self.dtype = dtype
+        self.create = create
+        size = HEADER_DTYPE.itemsize + slots * dtype.itemsize
+        if create:
+            self.shm = shared_memory.SharedMemory(name, create = True, size = size)
+        else:
+            self.shm = _attach(name)
+        self.header = np.ndarray((), HEADER_DTYPE, buffer = self.shm.buf)
+        if create:
+            self.header['counter'] = 0
+            self.header['slots'] = slots
+            self.header['itemsize'] = dtype.itemsize
+        elif self.header['slots'] != slots or self.header['itemsize'] != dtype.itemsize:
+            found = f'{int(self.header["slots"])} slots of {int(self.header["itemsize"])} bytes'
+            self.close()
+            raise ValueError(f'Layout of channel {name} does not match ({found})')
+        self.slots = np.ndarray((slots,), dtype, buffer = self.shm.buf, offset = HEADER_DTYPE.itemsize)
+        # frames the consumer missed or dropped because the ring was lapped
+        self.skipped = 0
+        self.torn = 0
+
+    @property
+    def counter(self) -> int:
+        # number of published frames
+        return int(self.header['counter'])
+
+    def write(self, stamp : float = None, **fields) -> int:
+        """Writes one frame into the next slot (producer only)
+        @param stamp : host time of the frame, default now
+        @param fields : slot fields, arrays shorter than the field fill its start
+        @return sequence number of the frame
+        """
+        fields = {key : np.asarray(value) for key, value in fields.items()}
+        # check before the slot is marked, a failed write must not destroy the frame in it
+        for key, value in fields.items():
+            shape = self.dtype[key].shape
+            if value.ndim and (value.ndim != len(shape) or any(a > b for a, b in zip(value.shape, shape))):
+                raise ValueError(f'Field {key} of shape {value.shape} does not fit into slot field {shape} of channel {self.name}')
+        n = self.counter
+        slot = self.slots[n % len(self.slots)]
+        slot['seq'] = 2 * n + 1
+        if 'stamp' in self.dtype.names:
+            slot['stamp'] = time.time() if stamp is None else stamp
+        for key, value in fields.items():
+            target = slot[key]
+            if value.ndim and value.shape != target.shape:
+                target[tuple(slice(0, k) for k in value.shape)] = value
+            else:
+                slot[key] = value
+        slot['seq'] = 2 * n + 2
+        self.header['counter'] = n + 1
+        return n
+
+    def view(self, seq : int):
+        """Slot of frame seq without copying, check intact(seq) after using it
+        @return structured scalar view or None if the frame is not available any more
+        """
+        slot = self.slots[seq % len(self.slots)]
+        return slot if slot['seq'] == 2 * seq + 2 else None
+
+    def intact(self, seq : int) -> bool:
+        # True if frame seq was not overwritten while it was used
+        return self.slots[seq % len(self.slots)]['seq'] == 2 * seq + 2
+
+    def read(self, seq : int):
+        # copy of frame seq, None if it was overwritten
+        slot = self.view(seq)
+        if slot is None: return None
+        frame = slot.copy()
+        if not self.intact(seq):
+            self.torn += 1
+            return None
+        return frame
+
+    def latest(self, after : int = -1, copy : bool = True):
+        """Newest frame if it is newer than after
+        @param after : sequence number the consumer already has
+        @param copy : False returns a view (zero copy), check intact() after use
+        @return (seq, frame) or None
+        """
+        seq = self.counter - 1
+        if seq <= after: return None
+        if after >= 0: self.skipped += seq - after - 1
+        frame = self.read(seq) if copy else self.view(seq)
+        return None if frame is None else (seq, frame)
+
+    def wait(self, after : int = -1, timeout : float = None, poll : float = 0.001, copy : bool = True):
+        """Waits for a frame newer than after, see latest()
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            frame = self.latest(after, copy)
+            if frame is not None: return frame
+            if deadline is not None and time.perf_counter() > deadline: return None
+            time.sleep(poll)
+
+    def close(self):
+        # numpy views must be released before the block can be closed
+        self.header = self.slots = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # a consumer still holds a view, the mapping goes away with the process
+            pass
+        if self.create: self.shm.unlink()
+
+class FrameBus():
+    """Channels for camera frames, radar point clouds and fused results
+    @param name : prefix of the shared memory blocks
+    @param create : True for the owner process, all others attach with the same parameters
+    """
+    def __init__(self, name : str = 'sensorfusion', create : bool = False, width : int = 800, height : int = 600,
+                 max_points : int = 512, max_objects : int = 64, slots : int = 4):
+        self.name = name
+        layouts = {
+            'camera' : camera_dtype(width, height),
+            'radar' : radar_dtype(max_points),
+            'fused' : fused_dtype(max_objects)
+        }
+        self.channels = {}
+        try:
+            for channel, dtype in layouts.items():
+                self.channels[channel] = Channel(f'{name}_{channel}', dtype, slots, create)
+        except Exception:
+            self.close()
+            raise
+
+    def __getitem__(self, channel : str) -> Channel:
+        return self.channels[channel]
+
+    def publish_camera(self, img : np.ndarray, stamp : float = None, number : int = -1) -> int:
+        # writes a BGR image, smaller images fill the top left corner, larger ones are downscaled
+        height, width = self['camera'].dtype['image'].shape[:2]
+        h, w = img.shape[:2]
+        if h > height or w > width:
+            scale = min(height / h, width / w)
+            img = cv.resize(img, (min(int(w * scale), width), min(int(h * scale), height)), interpolation = cv.INTER_AREA)
+            h, w = img.shape[:2]
+        return self['camera'].write(stamp, number = number, height = h, width = w, image = img)
+
+    def publish_radar(self, frame, stamp : float = None) -> int:
+        # writes the columns of a PointCloudFrame, points beyond max_points are dropped
+        n = min(len(frame.x), self['radar'].dtype['x'].shape[0])
+        fields = {'number' : frame.header.get('number', 0), 'count' : n,
+                  'x' : frame.x[:n], 'y' : frame.y[:n], 'z' : frame.z[:n], 'doppler' : frame.doppler[:n]}
+        if frame.snr is not None: fields['snr'] = frame.snr[:n]
+        return self['radar'].write(stamp, **fields)
+
+    def publish_fused(self, fused : np.ndarray, camera : int = -1, radar : int = -1, stamp : float = None) -> int:
+        # writes fused objects (FUSED_DTYPE array) with the sequence numbers of their sources
+        n = min(len(fused), self['fused'].dtype['points'].shape[0])
+        fused = fused[:n]
+        boxes = np.column_stack([fused[key] for key in ('x1', 'y1', 'x2', 'y2', 'cls', 'conf')]) if n else np.zeros((0, 6))
+        return self['fused'].write(stamp, camera = camera, radar = radar, count = n, boxes = boxes,
+                                   points = fused['points'], range = fused['range'], velocity = fused['velocity'])
+
+    def close(self):
+        for channel in self.channels.values():
+            channel.close()
+        self.channels = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,34 +1,61 @@
-from dash import Dash, dcc, html, Input, Output, ctx, callback
+from dash import Dash, dcc, html, Input, Output, State, ctx, callback, no_update
 from dash.exceptions import PreventUpdate
-import plotly.graph_objects as go 
+import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
-import plotly.express as px
 import numpy as np
+import time
+from threading import Thread
+from multiprocessing import Process
+from streaming import FrameEncoder, RadarFeed, adapt_interval
+from bus import FrameBus
+
+# streaming backend, filled by the camera/radar producers
+encoder = FrameEncoder()
+radar_feed = RadarFeed()
 
 @callback(
-    [Output('image-graph', 'figure')],
+    [Output('image-graph', 'src'), Output('image-seq', 'data'), Output('interval-component', 'interval')],
     [Input('interval-component', 'n_intervals'), Input('switch-bbox','value')],
+    [State('image-seq', 'data'), State('interval-component', 'interval')],
     prevent_initial_call = True
 )
-def update(n_intervals, switch_bbox):
+def update(n_intervals, switch_bbox, image_seq, interval):
     if ctx.triggered_id == 'switch-bbox':
         # TODO: control camera process
         raise PreventUpdate
-    else:
-        # TODO: get real data from camera/radar process
-        img = np.random.randint(0, high = 255, size = (400, 800, 3), dtype = np.uint8)
-        fig_img = px.imshow(img)
-    # eventually there should be two graphs
-    return [fig_img]
+    # only send the image if it is newer than the one the client shows
+    src, seq = encoder.poll(image_seq)
+    interval = adapt_interval(interval / 1000, encoder.period, src is not None) * 1000
+    return [src if src is not None else no_update, seq, interval]
+
+@callback(
+    [Output('polarscatter-graph', 'extendData'), Output('radar-seq', 'data')],
+    [Input('interval-component', 'n_intervals')],
+    [State('radar-seq', 'data')],
+    prevent_initial_call = True
+)
+def update_radar(n_intervals, radar_seq):
+    # append the newest points, the graph drops the oldest ones itself
+    payload, seq = radar_feed.poll(radar_seq)
+    if payload is None: raise PreventUpdate
+    return [payload, seq]
+
+def polar_figure() -> go.Figure:
+    # empty trace that is extended by update_radar
+    fig = go.Figure(go.Scatterpolar(r = [], theta = [], mode = 'markers',
+                                    marker = {'color' : [], 'colorscale' : 'RdBu', 'cmin' : -2, 'cmax' : 2, 'size' : 6}))
+    fig.update_layout(polar = {'radialaxis' : {'range' : [0, 10]}, 'angularaxis' : {'rotation' : 90, 'direction' : 'clockwise'}},
+                      margin = {'l' : 20, 'r' : 20, 't' : 20, 'b' : 20}, uirevision = 'radar')
+    return fig
 
 def config_app() -> Dash:
     # dash app
     app = Dash(__name__, external_stylesheets = [dbc.themes.QUARTZ])
     # list for graph controls
     controls = [
-        dbc.Checklist(options=[{'label' : 'Object detection', 'value' : 1},], 
-                    value = [0], 
-                    id = 'switch-bbox', 
+        dbc.Checklist(options=[{'label' : 'Object detection', 'value' : 1},],
+                    value = [0],
+                    id = 'switch-bbox',
                     switch = True)
     ]
     # html layout
@@ -37,9 +64,12 @@ def config_app() -> Dash:
         dbc.Card(dbc.Row([dbc.Col(c) for c in controls]), body = True),
         html.Br(),
         dbc.Row([
-            dbc.Col(dcc.Graph(id = 'image-graph')),
-            dbc.Col(dcc.Graph(id = 'polarscatter-graph'))
+            dbc.Col(html.Img(id = 'image-graph', style = {'width' : '100%'})),
+            dbc.Col(dcc.Graph(id = 'polarscatter-graph', figure = polar_figure()))
         ]),
+        # sequence numbers of the frames shown by the client
+        dcc.Store(id = 'image-seq', data = -1),
+        dcc.Store(id = 'radar-seq', data = -1),
         dcc.Interval(
             id = 'interval-component',
             interval = 0.2 * 1000
@@ -47,7 +77,47 @@ def config_app() -> Dash:
     ])
     return app
 
+def bus_reader(bus : FrameBus):
+    # moves the newest camera/radar frames from the shared memory bus to the streaming backend
+    camera, radar = bus['camera'], bus['radar']
+    camera_seq, radar_seq = -1, -1
+    while True:
+        frame = camera.latest(camera_seq, copy = False)
+        if frame is not None:
+            camera_seq, slot = frame
+            # encoding runs later, copy only the valid part of the image
+            img = slot['image'][:slot['height'], :slot['width']].copy()
+            if camera.intact(camera_seq): encoder.submit(img)
+        frame = radar.latest(radar_seq, copy = False)
+        if frame is not None:
+            radar_seq, slot = frame
+            n = slot['count']
+            x, y, doppler = slot['x'][:n].copy(), slot['y'][:n].copy(), slot['doppler'][:n].copy()
+            if radar.intact(radar_seq): radar_feed.submit(x, y, doppler)
+        time.sleep(0.005)
+
+def demo_producer(name : str, fps : float = 20):
+    # stand-in for the camera and radar processes, they publish the same way
+    # (FrameBus.publish_camera with CameraStream images, publish_radar with Radar frames)
+    bus = FrameBus(name)
+    while True:
+        bus.publish_camera(np.random.randint(0, high = 255, size = (400, 800, 3), dtype = np.uint8))
+        n = np.random.randint(0, 20)
+        bus['radar'].write(count = n, x = np.random.uniform(-5, 5, n), y = np.random.uniform(0, 10, n),
+                           doppler = np.random.uniform(-2, 2, n))
+        time.sleep(1 / fps)
+
 if __name__ == '__main__':
-    # TODO: start other interfaces from here
+    # shared memory bus, owned by the gui process
+    bus = FrameBus('sensorfusion', create = True)
+    # start other interfaces from here, each one attaches to the bus by name
+    producers = [Process(target = demo_producer, args = (bus.name,), daemon = True)]
+    for producer in producers:
+        producer.start()
+    Thread(target = bus_reader, args = (bus,), daemon = True).start()
     app = config_app()
-    app.run(debug = True)
\ No newline at end of file
+    try:
+        # the reloader would start a second gui process with its own bus
+        app.run(debug = True, use_reloader = False)
+    finally:
+        bus.close()
@@ -0,0 +1,130 @@
+import time
+import base64
+import cv2 as cv
+import numpy as np
+from threading import Thread, Condition
+
+"""Streaming backend of the GUI
+
+Camera frames are JPEG encoded on a background thread, only the newest frame is kept,
+so the browser gets a small data URI (html.Img src) instead of a whole Plotly figure.
+Radar points are sent as extendData payloads, the polar plot keeps a trail of the last
+points without being rebuilt.
+
+Both feeds hand out a frame only if it is newer than the one the client already has,
+the poll interval follows the camera frame period and grows while nothing new arrives,
+so a slow client skips frames instead of queueing them.
+"""
+
+class FrameEncoder():
+    """Encodes the newest submitted image as JPEG data URI on a background thread
+    @param quality : JPEG quality (0-100)
+    @param max_width : images are downscaled to this width before encoding, None keeps the size
+    """
+    def __init__(self, quality : int = 80, max_width : int = 800):
+        self.params = [cv.IMWRITE_JPEG_QUALITY, quality]
+        self.max_width = max_width
+        self.condition = Condition()
+        # newest raw image and its sequence number
+        self.pending = None
+        self.submitted = -1
+        # newest encoded image
+        self.src = None
+        self.seq = -1
+        # statistics
+        self.skipped = 0
+        self.encode_time = 0.0
+        # smoothed time between submitted frames in s
+        self.period = None
+        self.last_submit = None
+        self.running = True
+        self.thread = Thread(target = self._run, name = 'gui-encoder', daemon = True)
+        self.thread.start()
+
+    def submit(self, img : np.ndarray) -> None:
+        # producer side, replaces a frame that was not encoded yet
+        now = time.perf_counter()
+        with self.condition:
+            if self.pending is not None: self.skipped += 1
+            self.submitted += 1
+            self.pending = (self.submitted, img)
+            if self.last_submit is not None:
+                dt = now - self.last_submit
+                self.period = dt if self.period is None else 0.9 * self.period + 0.1 * dt
+            self.last_submit = now
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or not self.running)
+                if not self.running: return
+                seq, img = self.pending
+                self.pending = None
+            start = time.perf_counter()
+            if self.max_width is not None and img.shape[1] > self.max_width:
+                scale = self.max_width / img.shape[1]
+                img = cv.resize(img, None, fx = scale, fy = scale, interpolation = cv.INTER_AREA)
+            ok, jpeg = cv.imencode('.jpg', img, self.params)
+            if not ok: continue
+            src = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+            self.encode_time = time.perf_counter() - start
+            # single reference assignment, readers never see a half written frame
+            self.src, self.seq = src, seq
+
+    def poll(self, client_seq : int):
+        """Newest encoded frame if the client does not have it yet
+        @param client_seq : sequence number of the frame shown by the client
+        @return (src, seq), src is None if there is nothing new
+        """
+        src, seq = self.src, self.seq
+        if src is None or seq == client_seq: return None, client_seq
+        return src, seq
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+class RadarFeed():
+    """Newest radar points for the polar plot
+    @param trail : number of points the plot keeps (extendData maxPoints)
+    """
+    def __init__(self, trail : int = 200):
+        self.trail = trail
+        self.points = None
+        self.seq = -1
+
+    def submit(self, x : np.ndarray, y : np.ndarray, doppler : np.ndarray = None) -> None:
+        # range and azimuth (deg, 0 = boresight) of the points
+        x = np.asarray(x, dtype = np.float64)
+        y = np.asarray(y, dtype = np.float64)
+        r = np.hypot(x, y)
+        theta = np.degrees(np.arctan2(x, y))
+        color = np.zeros_like(r) if doppler is None else np.asarray(doppler, dtype = np.float64)
+        self.points = (self.seq + 1, np.round(r, 3).tolist(), np.round(theta, 2).tolist(), np.round(color, 2).tolist())
+        self.seq += 1
+
+    def poll(self, client_seq : int):
+        """extendData payload of the newest frame if the client does not have it yet
+        @return (payload, seq), payload is None if there is nothing new
+        """
+        points = self.points
+        if points is None or points[0] == client_seq: return None, client_seq
+        seq, r, theta, color = points
+        return ({'r' : [r], 'theta' : [theta], 'marker.color' : [color]}, [0], self.trail), seq
+
+def adapt_interval(interval : float, period : float, updated : bool, low : float = 0.03, high : float = 1.0) -> float:
+    """Next poll interval in s
+    @param interval : current interval
+    @param period : frame period of the source, None if unknown
+    @param updated : True if the last poll delivered something new
+    """
+    if updated and period is not None:
+        # follow the source
+        interval = period
+    elif not updated:
+        # nothing new, back off
+        interval *= 1.25
+    return min(max(interval, low), high)
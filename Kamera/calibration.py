@@ -1,13 +1,22 @@
 import numpy as np
 import cv2 as cv
 import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from argparse import ArgumentParser, Namespace
-from utils import load_from_folder, save_coeffs
+from utils import image_files, save_coeffs
 
 """Functions for grabbing calibration images (user still needs to manually select valid ones)
 and finding camera matrix and distortion coefficients
+
+Chessboard corners are searched on a downscaled image and refined at full resolution,
+one image per worker process. Results are cached per image content in images/.corners,
+so re-running with another alpha or a subset of images only repeats calibrateCamera.
 """
 
+# cache of detected corners, keyed by image content and pattern size
+CORNER_CACHE = 'images/.corners'
+
 def grab_images(args : Namespace):
     # check if output directory exists
     if not os.path.exists(f'images/{args.out}'): os.makedirs(f'images/{args.out}')
@@ -35,31 +44,66 @@ def grab_images(args : Namespace):
         if k == 27 or i == args.num_imgs: break
     cv.destroyAllWindows() 
 
+def find_corners(path : str, pattern : tuple, max_side : int = 800, cache : str = CORNER_CACHE) -> tuple:
+    """Finds chessboard corners in one image (runs in a worker process)
+    @param path : image file
+    @param pattern : (rows, cols) inner corners of the chessboard
+    @param max_side : longer image side for the coarse search, None searches at full resolution
+    @param cache : directory for cached results, None disables the cache
+    @return (corners or None, (width, height))
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    key = f'{hashlib.sha1(data).hexdigest()}_{pattern[0]}x{pattern[1]}_{max_side}'
+    cached = os.path.join(cache, f'{key}.npz') if cache is not None else None
+    if cached is not None and os.path.exists(cached):
+        result = np.load(cached)
+        return (result['corners'] if result['found'] else None), tuple(result['size'])
+    gray = cv.imdecode(np.frombuffer(data, np.uint8), cv.IMREAD_GRAYSCALE)
+    size = gray.shape[::-1]
+    # coarse search on a downscaled image
+    scale = min(1.0, max_side / max(size)) if max_side else 1.0
+    small = cv.resize(gray, None, fx = scale, fy = scale, interpolation = cv.INTER_AREA) if scale < 1.0 else gray
+    found, corners = cv.findChessboardCorners(small, pattern, None)
+    if found:
+        # termination criteria for cornerSubPix()
+        criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+        # refine at full resolution
+        corners = cv.cornerSubPix(gray, (corners / scale).astype(np.float32), (11,11), (-1,-1), criteria)
+    if cached is not None:
+        os.makedirs(cache, exist_ok = True)
+        np.savez(cached, found = found, corners = corners if found else np.zeros((0, 1, 2), np.float32), size = size)
+    return (corners if found else None), size
+
+def detect_all(paths : list, pattern : tuple, max_side : int = 800, workers : int = None) -> list:
+    """Finds chessboard corners in all images on a process pool
+    @return list of (corners or None, size) in the order of paths
+    """
+    with ProcessPoolExecutor(workers, initializer = cv.setNumThreads, initargs = (1,)) as pool:
+        return list(pool.map(find_corners, paths, [pattern] * len(paths), [max_side] * len(paths)))
+
 def calibrate(args : Namespace):
-    # termination criteria for cornerSubPix()
-    criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    pattern = (args.rows, args.cols)
     # prepare Object points
     objp = np.zeros((args.cols*args.rows, 3), np.float32)
     objp[:,:2] = np.mgrid[0:args.rows,0:args.cols].T.reshape(-1, 2)
+    # calibration images, optionally only a subset
+    paths = image_files(f'images/{args.inp}')
+    if args.subset: paths = [p for p in paths if os.path.basename(p) in args.subset]
+    # corners of all images (cached results are only loaded)
+    results = detect_all(paths, pattern, args.max_side, args.workers)
     # 3d points in world
-    objpoints = []
+    objpoints = [objp for corners, _ in results if corners is not None]
     # 2d points in image plane
-    imgpoints = []
-    # load calibration images
-    images = load_from_folder(f'images/{args.inp}')
-    for image in images:
-        gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
-        ret, corners = cv.findChessboardCorners(gray, (args.rows,args.cols), None)
-        if ret == True:
-            objpoints.append(objp)
-            corners_fine = cv.cornerSubPix(gray, corners, (11,11), (-1,-1), criteria)
-            imgpoints.append(corners_fine)
+    imgpoints = [corners for corners, _ in results if corners is not None]
+    print(f'Chessboard found in {len(imgpoints)}/{len(paths)} images')
     # assumption: distorted image has same dimensions as calibration images
+    size = results[0][1]
     # get camera matrix from object, image points
-    ret, mtx, dist, rvecs, tvecs = cv.calibrateCamera(objpoints, imgpoints, gray.shape[::-1], None, None)
+    ret, mtx, dist, rvecs, tvecs = cv.calibrateCamera(objpoints, imgpoints, size, None, None)
     print(f'Calibration Error: {ret}')
     # get refined camera matrix, cuts all invalid pixels from image and resizes to input
-    newmtx, _ = cv.getOptimalNewCameraMatrix(mtx, dist, gray.shape[::-1], args.alpha, gray.shape[::-1])
+    newmtx, _ = cv.getOptimalNewCameraMatrix(mtx, dist, size, args.alpha, size)
     mtx_rad = mtx.copy()
     # radar y grows upward -> flip sign of f_y
     mtx_rad[1,1] = -mtx_rad[1,1]
@@ -79,12 +123,15 @@ if __name__ == '__main__':
     # arguments for grab_images
     parser.add_argument('--cam', help = 'Capture device to use', default = 2, type = int)
     parser.add_argument('--out', help = 'Name of output directory', default = 'test')
-    parser.add_argument('--num_imgs', help = 'Amount of images to capture', default = 50)
+    parser.add_argument('--num_imgs', help = 'Amount of images to capture', default = 50, type = int)
     # arguments for calibrate
     parser.add_argument('--inp', help = 'Folder with input images', default = 'test')
-    parser.add_argument('--rows', help = 'Number of rows in checkerboard pattern', default = 8)
-    parser.add_argument('--cols', help = 'Number of cols in checkerboard pattern', default = 6)
-    parser.add_argument('--alpha', help = 'Crop images ? 1.0 : 0.0', default = 0.0)
+    parser.add_argument('--rows', help = 'Number of rows in checkerboard pattern', default = 8, type = int)
+    parser.add_argument('--cols', help = 'Number of cols in checkerboard pattern', default = 6, type = int)
+    parser.add_argument('--alpha', help = 'Crop images ? 1.0 : 0.0', default = 0.0, type = float)
+    parser.add_argument('--subset', help = 'Only use these image files', nargs = '*')
+    parser.add_argument('--max_side', help = 'Longer image side for the coarse corner search (0: full resolution)', default = 800, type = int)
+    parser.add_argument('--workers', help = 'Number of worker processes (default: all cores)', default = None, type = int)
     args = parser.parse_args()
 
     if args.mode == 'calibrate':
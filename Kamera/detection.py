@@ -0,0 +1,228 @@
+from ultralytics import YOLO
+from ultralytics.utils.plotting import Annotator
+from threading import Thread, Event
+from queue import Queue, Full, Empty
+import os
+import glob
+import time
+import numpy as np
+from utils import CameraStream, Coefficients
+
+"""Object detection stage for the camera path
+
+Detector wraps a YOLO model: warmup at startup, configurable inference size,
+optional exported backend (e.g. 'onnx', 'openvino') and boxes as one array per image
+with columns (x1, y1, x2, y2, cls, conf).
+
+DetectionPipeline overlaps capture (CameraStream thread), preprocessing (undistortion),
+inference on micro-batches and annotation, each stage runs in its own thread
+connected by small queues that drop the oldest item when full.
+
+Usage:
+    detector = Detector('yolov8n.pt', imgsz = 480)
+    with DetectionPipeline(CameraStream(0), detector, coeffs) as pipeline:
+        for result in pipeline.results():
+            cv.imshow('Detection', result['img'])
+"""
+
+# columns of the box array
+X1, Y1, X2, Y2, CLS, CONF = range(6)
+
+class Detector():
+    """YOLO model returning boxes as numpy arrays
+    @param weights : path of the .pt model
+    @param imgsz : inference resolution (longer side)
+    @param conf : confidence threshold
+    @param device : torch device, 'cpu' works everywhere
+    @param backend : None for pytorch or an ultralytics export format ('onnx', 'openvino', 'torchscript', 'engine'),
+                     the exported model is created next to the weights once per (backend, imgsz, batch)
+                     and reused afterwards
+    @param batch : largest batch size that will be passed to __call__
+    @param warmup : number of dummy predictions at startup
+    """
+    def __init__(self, weights : str = 'yolov8n.pt', imgsz : int = 640, conf : float = 0.25, device : str = 'cpu',
+                 backend : str = None, batch : int = 1, warmup : int = 2):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.device = device
+        self.batch = batch
+        model = YOLO(weights)
+        # class names are kept from the pytorch model, exported models may not carry them
+        self.names = model.names
+        if backend is not None:
+            model = YOLO(self._export(model, weights, backend, imgsz, batch), task = 'detect')
+        self.model = model
+        # first calls allocate buffers and compile kernels, keep them out of the capture loop
+        dummy = np.zeros((imgsz, imgsz, 3), dtype = np.uint8)
+        for _ in range(warmup):
+            self([dummy] * batch)
+
+    @staticmethod
+    def _export(model : YOLO, weights : str, backend : str, imgsz : int, batch : int) -> str:
+        # exports take seconds to minutes, keep one per settings: yolov8n_640_b1.onnx, yolov8n_640_b1_openvino_model
+        stem = os.path.splitext(weights)[0]
+        tag = f'{stem}_{imgsz}_b{batch}'
+        for path in glob.glob(f'{glob.escape(tag)}[._]*'):
+            if backend in os.path.basename(path)[len(os.path.basename(tag)):]:
+                return path
+        # batches of varying size need dynamic input shapes
+        path = str(model.export(format = backend, imgsz = imgsz, batch = batch, dynamic = batch > 1))
+        # keep the suffix, ultralytics detects the format from it
+        target = os.path.join(os.path.dirname(path), os.path.basename(path).replace(os.path.basename(stem), os.path.basename(tag), 1))
+        os.replace(path, target)
+        return target
+
+    def __call__(self, images : list) -> list:
+        """Runs one prediction on a batch of images
+        @param images : list of BGR images
+        @return list of float32 arrays (N, 6) with x1, y1, x2, y2, cls, conf in pixels of the input image
+        """
+        results = self.model.predict(images, imgsz = self.imgsz, conf = self.conf, device = self.device, verbose = False)
+        # boxes.data columns are x1, y1, x2, y2, conf, cls
+        return [r.boxes.data.cpu().numpy()[:, [0, 1, 2, 3, 5, 4]].astype(np.float32) for r in results]
+
+def annotate(img : np.ndarray, boxes : np.ndarray, names : dict, labels : list = None, color : tuple = (255,0,0)) -> np.ndarray:
+    """Draws boxes on img
+    @param boxes : array (N, 6) from Detector
+    @param names : class names of the model
+    @param labels : optional extra text per box (e.g. distance, velocity)
+    @return annotated image
+    """
+    annotator = Annotator(img)
+    for i, (xyxy, c) in enumerate(zip(boxes[:, :4].tolist(), boxes[:, CLS].astype(int).tolist())):
+        label = names[c] if labels is None or not labels[i] else f'{names[c]} {labels[i]}'
+        annotator.box_label(xyxy, label, color = color)
+    return annotator.result()
+
+class DetectionPipeline():
+    """Threads for preprocessing, inference and annotation behind a CameraStream
+    @param stream : CameraStream (started on start() if needed)
+    @param detector : Detector
+    @param coeffs : calibration coefficients for undistortion, None skips it
+    @param max_batch : largest micro-batch, limited by detector.batch
+    @param max_wait : seconds inference waits for more frames to fill a batch (latency budget)
+    @param draw : annotate images, False only returns the boxes
+    @param maxsize : capacity of the queues between stages
+    """
+    def __init__(self, stream : CameraStream, detector : Detector, coeffs : Coefficients = None, max_batch : int = 1,
+                 max_wait : float = 0.0, draw : bool = True, maxsize : int = 4):
+        self.stream = stream
+        self.detector = detector
+        self.coeffs = coeffs
+        self.max_batch = max(1, min(max_batch, detector.batch))
+        self.max_wait = max_wait
+        self.draw = draw
+        self.images = Queue(max(maxsize, self.max_batch))
+        self.detections = Queue(maxsize)
+        self.output = Queue(maxsize)
+        self.running = Event()
+        self.threads = []
+        # items discarded because a stage was too slow
+        self.dropped = 0
+        # seconds of the last inference call and its batch size
+        self.inference_time = 0.0
+        self.batch_size = 0
+
+    def start(self):
+        if self.running.is_set(): return self
+        if not self.stream.running: self.stream.start()
+        self.running.set()
+        self.threads = [
+            Thread(target = self._preprocess, name = 'camera-preprocess', daemon = True),
+            Thread(target = self._infer, name = 'camera-inference', daemon = True),
+            Thread(target = self._annotate, name = 'camera-annotate', daemon = True)
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        if not self.running.is_set(): return
+        self.running.clear()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def _put(self, queue : Queue, item):
+        # drop the oldest item if the next stage is too slow, end markers always get in
+        while True:
+            try:
+                queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    queue.get_nowait()
+                    self.dropped += 1
+                except Empty:
+                    pass
+
+    def _preprocess(self):
+        # newest camera frame -> undistorted image
+        try:
+            while self.running.is_set():
+                frame = self.stream.latest(timeout = 0.1)
+                if frame is None:
+                    if not self.stream.running: break
+                    continue
+                seq, stamp, img = frame
+                if self.coeffs is not None: img = self.coeffs.undistort(img)
+                self._put(self.images, (seq, stamp, img))
+        finally:
+            self._put(self.images, None)
+
+    def _infer(self):
+        # micro-batches of images -> boxes
+        try:
+            done = False
+            while not done:
+                try:
+                    item = self.images.get(timeout = 0.1)
+                except Empty:
+                    if not self.running.is_set(): break
+                    continue
+                if item is None: break
+                batch = [item]
+                deadline = time.perf_counter() + self.max_wait
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self.images.get(timeout = max(deadline - time.perf_counter(), 0))
+                    except Empty:
+                        break
+                    if item is None:
+                        done = True
+                        break
+                    batch.append(item)
+                start = time.perf_counter()
+                boxes = self.detector([img for _, _, img in batch])
+                self.inference_time = time.perf_counter() - start
+                self.batch_size = len(batch)
+                for (seq, stamp, img), b in zip(batch, boxes):
+                    self._put(self.detections, (seq, stamp, img, b))
+        finally:
+            self._put(self.detections, None)
+
+    def _annotate(self):
+        try:
+            while True:
+                item = self.detections.get()
+                if item is None: break
+                seq, stamp, img, boxes = item
+                if self.draw: img = annotate(img, boxes, self.detector.names)
+                self._put(self.output, {'seq' : seq, 'stamp' : stamp, 'img' : img, 'boxes' : boxes})
+        finally:
+            self._put(self.output, None)
+
+    def results(self):
+        """Yields dicts with seq, stamp (capture time), img and boxes until the pipeline stops
+        """
+        while True:
+            result = self.output.get()
+            if result is None: return
+            yield result
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+        self.stream.stop()
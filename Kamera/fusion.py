@@ -0,0 +1,158 @@
+import numpy as np
+from utils import radar_points, project_points
+
+"""Association of projected radar points with camera detections
+
+Projected points are sorted into an image-space grid once per frame, every box only
+looks at the grid cells it covers (one contiguous slice per grid row), so associating
+M points with N boxes costs about O(M log M + N * rows + candidates) instead of O(M * N).
+A point inside several boxes belongs to the smallest one (usually the object in front).
+
+Every box gets the number of points and a robust range / radial velocity / SNR estimate,
+either the median or the SNR-weighted mean of its points.
+
+Usage:
+    proj, index = project_points(frame, coeffs, size = (w, h), undistorted = True)
+    fused = associate(proj, index, frame, boxes)
+    img = annotate(img, fused_boxes(fused), model.names, labels = fused_labels(fused))
+"""
+
+# one fused object per detection
+FUSED_DTYPE = np.dtype([
+    ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'), ('cls', '<f4'), ('conf', '<f4'),
+    ('points', '<i4'), ('range', '<f4'), ('velocity', '<f4'), ('snr', '<f4')
+])
+
+def radar_columns(data) -> tuple:
+    """Radar point attributes of one frame
+    @param data : PointCloudFrame, legacy dict or (N,3) array
+    @return (points (N,3), doppler (N,) or None, snr (N,) or None)
+    """
+    points = radar_points(data)
+    if isinstance(data, dict):
+        doppler = np.array([p['v'] for p in data.get('detected_points', {}).values()], dtype = np.float64)
+        side_info = data.get('side_info')
+        snr = None if side_info is None else np.array([s['snr'] for s in side_info.values()], dtype = np.float64)
+        return points, doppler, snr
+    doppler = getattr(data, 'doppler', None)
+    snr = getattr(data, 'snr', None)
+    return points, doppler, snr
+
+def grid_assign(uv : np.ndarray, boxes : np.ndarray, cell : int = 32) -> tuple:
+    """Assigns image points to the smallest box containing them
+    @param uv : (M,2) pixel coordinates
+    @param boxes : (N,>=4) boxes with x1, y1, x2, y2 in the first columns
+    @param cell : grid cell size in pixels
+    @return (point, box) : index arrays of the assigned pairs, sorted by box
+    """
+    empty = np.empty(0, dtype = np.intp)
+    if not len(uv) or not len(boxes): return empty, empty
+    # bucket points by grid cell, row major
+    cells = np.floor(uv / cell).astype(np.int64)
+    origin = cells.min(axis = 0)
+    cells -= origin
+    cols = int(cells[:, 0].max()) + 1
+    rows = int(cells[:, 1].max()) + 1
+    keys = cells[:, 1] * cols + cells[:, 0]
+    order = np.argsort(keys, kind = 'stable')
+    keys = keys[order]
+    # cells covered by each box, clipped to the grid
+    first = np.floor(boxes[:, :2] / cell).astype(np.int64) - origin
+    last = np.floor(boxes[:, 2:4] / cell).astype(np.int64) - origin
+    first = np.maximum(first, 0)
+    last = np.minimum(last, (cols - 1, rows - 1))
+    candidates = []
+    owners = []
+    for b, ((c0, r0), (c1, r1)) in enumerate(zip(first.tolist(), last.tolist())):
+        if c0 > c1 or r0 > r1: continue
+        # one contiguous slice of sorted keys per grid row
+        row_keys = np.arange(r0, r1 + 1) * cols
+        lo = np.searchsorted(keys, row_keys + c0, 'left')
+        hi = np.searchsorted(keys, row_keys + c1, 'right')
+        for a, z in zip(lo.tolist(), hi.tolist()):
+            if a < z:
+                candidates.append(order[a:z])
+                owners.append(np.full(z - a, b, dtype = np.intp))
+    if not candidates: return empty, empty
+    point = np.concatenate(candidates)
+    box = np.concatenate(owners)
+    # exact containment test on the candidates only
+    u, v = uv[point, 0], uv[point, 1]
+    inside = (u >= boxes[box, 0]) & (u <= boxes[box, 2]) & (v >= boxes[box, 1]) & (v <= boxes[box, 3])
+    point, box = point[inside], box[inside]
+    # points in several boxes go to the smallest box
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    pick = np.lexsort((area[box], point))
+    point, box = point[pick], box[pick]
+    unique = np.ones(len(point), dtype = bool)
+    unique[1:] = point[1:] != point[:-1]
+    point, box = point[unique], box[unique]
+    pick = np.argsort(box, kind = 'stable')
+    return point[pick], box[pick]
+
+def _estimate(values : np.ndarray, weights : np.ndarray, method : str) -> float:
+    if method == 'snr' and weights is not None and weights.sum() > 0:
+        return float(np.average(values, weights = weights))
+    return float(np.median(values))
+
+def associate(proj : np.ndarray, index : np.ndarray, frame, boxes : np.ndarray, method : str = 'median', cell : int = 32) -> np.ndarray:
+    """Joins radar points and detections of one frame
+    @param proj, index : output of project_points for frame
+    @param frame : radar frame (PointCloudFrame, legacy dict)
+    @param boxes : (N,6) detections x1, y1, x2, y2, cls, conf (see detection.Detector)
+    @param method : 'median' or 'snr' (SNR-weighted mean, median if the frame has no SNR)
+    @param cell : grid cell size in pixels
+    @return structured array (N,) of FUSED_DTYPE, range/velocity/snr are NaN for boxes without points
+    """
+    if method not in ('median', 'snr'):
+        raise ValueError(f'Unknown estimate: {method}')
+    boxes = np.asarray(boxes, dtype = np.float32).reshape(-1, 6)
+    fused = np.zeros(len(boxes), dtype = FUSED_DTYPE)
+    for i, name in enumerate(('x1', 'y1', 'x2', 'y2', 'cls', 'conf')):
+        fused[name] = boxes[:, i]
+    fused['range'] = fused['velocity'] = fused['snr'] = np.nan
+    point, box = grid_assign(proj[:2].T, boxes, cell)
+    if not len(point): return fused
+    points, doppler, snr = radar_columns(frame)
+    # visible point -> radar point of the frame
+    source = index[point]
+    ranges = np.linalg.norm(points[source], axis = 1)
+    velocity = None if doppler is None else np.asarray(doppler, dtype = np.float64)[source]
+    weights = None if snr is None else np.asarray(snr, dtype = np.float64)[source]
+    # pairs are sorted by box, split into one group per box
+    starts = np.flatnonzero(np.r_[True, box[1:] != box[:-1]])
+    ends = np.r_[starts[1:], len(box)]
+    for a, z in zip(starts.tolist(), ends.tolist()):
+        b = box[a]
+        w = None if weights is None else weights[a:z]
+        fused['points'][b] = z - a
+        fused['range'][b] = _estimate(ranges[a:z], w, method)
+        if velocity is not None: fused['velocity'][b] = _estimate(velocity[a:z], w, method)
+        if w is not None: fused['snr'][b] = np.median(w)
+    return fused
+
+def fuse(frame, boxes : np.ndarray, calib_params : dict, size : tuple, undistorted : bool = True, method : str = 'median', **kwargs) -> np.ndarray:
+    """Projects one radar frame and associates it with the detections of one image
+    @param size : (width, height) of the image the boxes belong to
+    @param undistorted : True if the detector saw undistorted images (DetectionPipeline with coeffs)
+    @param kwargs : extrinsics R, t and min_depth for project_points
+    @return structured array of FUSED_DTYPE, see associate
+    """
+    proj, index = project_points(frame, calib_params, size = size, undistorted = undistorted, **kwargs)
+    return associate(proj, index, frame, boxes, method)
+
+def fused_boxes(fused : np.ndarray) -> np.ndarray:
+    # (N,6) box array for detection.annotate
+    return np.column_stack([fused[name] for name in ('x1', 'y1', 'x2', 'y2', 'cls', 'conf')])
+
+def fused_labels(fused : np.ndarray) -> list:
+    # label text per box for detection.annotate, empty if no radar point hit the box
+    labels = []
+    for n, r, v in zip(fused['points'].tolist(), fused['range'].tolist(), fused['velocity'].tolist()):
+        if not n:
+            labels.append('')
+        elif v != v:
+            labels.append(f'{r:.1f} m')
+        else:
+            labels.append(f'{r:.1f} m {v:+.1f} m/s')
+    return labels
@@ -1,6 +1,6 @@
 import cv2 as cv
 import numpy as np
-from utils import load_coeffs, project_points
+from utils import load_coeffs, project_points, CameraStream
 import matplotlib.pyplot as plt
 
 
@@ -32,12 +32,9 @@ if __name__ == '__main__':
 
     # project points to image plane
     coeffs = load_coeffs('wide_lense')
-    points = project_points(data, coeffs)
+    points, _ = project_points(data, coeffs, size = (800, 600))
 
-    cap = cv.VideoCapture(2, cv.CAP_DSHOW)
-    cap.set(cv.CAP_PROP_FPS, 20)
-    cap.set(cv.CAP_PROP_FRAME_WIDTH, 800)
-    cap.set(cv.CAP_PROP_FRAME_HEIGHT, 600)
+    cap = CameraStream(2, width = 800, height = 600, fps = 20, api = cv.CAP_DSHOW).start()
 
     # discard images until camera is initiated
     while True:
@@ -47,6 +44,7 @@ if __name__ == '__main__':
         cv.imshow("grab", img)
         c = cv.waitKey(1)
         if c == 27: break
+    cap.release()
     cv.destroyAllWindows()
 
     # BGR2RGB
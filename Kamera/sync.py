@@ -0,0 +1,234 @@
+import time
+from collections import deque
+
+"""Timestamp based pairing of radar and camera frames
+
+Radar frames carry the sensor CPU cycle counter (header['time'], 32 bit, wraps every few seconds),
+camera frames the host time of the grab (CameraStream). The synchronizer unwraps the counter,
+estimates the host-to-sensor clock offset as the sliding minimum of (arrival - sensor time)
+(the frame with the least transport delay) and keeps both streams in fixed-size ring buffers.
+
+Each camera frame is matched to the nearest radar frame, or to the two radar frames around it
+with an interpolation weight, if they are within the tolerance. Lookups are binary searches
+over the ring buffer, memory is bounded by the capacities.
+
+Usage:
+    sync = Synchronizer(tolerance = 0.05)
+    sync.push_radar(frame, time.time())
+    sync.push_camera(img, stamp)
+    for pair in sync.pop():
+        ...
+"""
+
+class RingBuffer():
+    """Fixed-size buffer of (time, item) with non-decreasing times
+    @param capacity : number of entries, the oldest one is overwritten when full
+    """
+    def __init__(self, capacity : int = 64):
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.items = [None] * capacity
+        # index of the oldest entry and number of entries
+        self.start = 0
+        self.count = 0
+        # entries overwritten before they were used
+        self.overwritten = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, t : float, item) -> None:
+        if self.count and t < self.time(self.count - 1):
+            raise ValueError('Timestamps must not decrease')
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+            self.overwritten += 1
+        i = (self.start + self.count) % self.capacity
+        self.times[i] = t
+        self.items[i] = item
+        self.count += 1
+
+    def time(self, i : int) -> float:
+        # time of the i-th oldest entry
+        return self.times[(self.start + i) % self.capacity]
+
+    def item(self, i : int):
+        return self.items[(self.start + i) % self.capacity]
+
+    def bisect(self, t : float) -> int:
+        # number of entries with time < t, O(log n)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.time(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def popleft(self):
+        # removes and returns the oldest (time, item)
+        if not self.count: raise IndexError('pop from empty buffer')
+        i = self.start
+        entry = (self.times[i], self.items[i])
+        self.items[i] = None
+        self.start = (self.start + 1) % self.capacity
+        self.count -= 1
+        return entry
+
+class ClockOffset():
+    """Host-to-sensor clock offset from the radar frame counter
+    @param clock : sensor CPU clock in Hz (header['time'] counts cycles)
+    @param window : number of frames for the sliding minimum
+    @param bits : width of the cycle counter
+    """
+    def __init__(self, clock : float = 600e6, window : int = 100, bits : int = 32):
+        self.clock = clock
+        self.window = window
+        self.wrap = 1 << bits
+        self.cycles = None
+        self.wraps = 0
+        self.frames = 0
+        # monotonic deque of (frame, offset) for the sliding minimum
+        self.candidates = deque()
+        self.offset = None
+
+    def sensor_time(self, cycles : int) -> float:
+        # unwrapped sensor time in s, must be called in frame order
+        if self.cycles is not None and cycles < self.cycles:
+            self.wraps += 1
+        self.cycles = cycles
+        return (self.wraps * self.wrap + cycles) / self.clock
+
+    def update(self, cycles : int, arrival : float) -> float:
+        """Records one radar frame
+        @param cycles : header['time']
+        @param arrival : host time when the frame was received
+        @return host time of the frame at the sensor
+        """
+        sensor = self.sensor_time(cycles)
+        offset = arrival - sensor
+        self.frames += 1
+        candidates = self.candidates
+        while candidates and candidates[-1][1] >= offset:
+            candidates.pop()
+        candidates.append((self.frames, offset))
+        while candidates[0][0] <= self.frames - self.window:
+            candidates.popleft()
+        self.offset = candidates[0][1]
+        return sensor + self.offset
+
+class SyncedPair():
+    __slots__ = ('camera', 'camera_time', 'radar', 'radar_time', 'weight', 'delta', 'latency')
+
+    def __init__(self, camera, camera_time : float, radar, radar_time, weight : float = 1.0, now : float = None):
+        """
+        @param camera : camera item (e.g. image or pipeline result)
+        @param camera_time : host time of the grab
+        @param radar : matched radar frame, (before, after) when interpolating
+        @param radar_time : host time of the radar frame(s)
+        @param weight : interpolation weight of 'after', 1.0 for nearest matches
+        @param now : host time the pair was formed, default now
+        """
+        self.camera = camera
+        self.camera_time = camera_time
+        self.radar = radar
+        self.radar_time = radar_time
+        self.weight = weight
+        # camera - radar time of the (nearest) radar frame
+        nearest = radar_time if not isinstance(radar_time, tuple) else radar_time[weight >= 0.5]
+        self.delta = camera_time - nearest
+        # age of the oldest capture when the pair was formed
+        self.latency = (time.time() if now is None else now) - min(camera_time, nearest)
+
+    def __repr__(self) -> str:
+        return f'SyncedPair(delta={self.delta * 1000:.1f} ms, latency={self.latency * 1000:.1f} ms, weight={self.weight:.2f})'
+
+class Synchronizer():
+    """Pairs camera frames with radar frames by time
+    @param tolerance : largest allowed time difference in s
+    @param mode : 'nearest' or 'interpolate' (both radar frames around the camera frame)
+    @param capacity : ring buffer size per stream
+    @param max_wait : s a camera frame waits for a later radar frame before it is matched anyway
+    @param clock, window : see ClockOffset
+    """
+    def __init__(self, tolerance : float = 0.05, mode : str = 'nearest', capacity : int = 64, max_wait : float = 0.3,
+                 clock : float = 600e6, window : int = 100):
+        if mode not in ('nearest', 'interpolate'):
+            raise ValueError(f'Unknown sync mode: {mode}')
+        self.tolerance = tolerance
+        self.mode = mode
+        self.max_wait = max_wait
+        self.radar = RingBuffer(capacity)
+        self.camera = RingBuffer(capacity)
+        self.clock = ClockOffset(clock, window)
+        # statistics
+        self.matched = 0
+        self.unmatched = 0
+
+    @property
+    def offset(self) -> float:
+        # host - sensor clock in s
+        return self.clock.offset
+
+    def push_radar(self, frame, arrival : float = None) -> float:
+        """Adds a radar frame (PointCloudFrame or legacy dict)
+        @param arrival : host time the frame was received, default now
+        @return estimated host time of the frame
+        """
+        header = frame['header'] if isinstance(frame, dict) else frame.header
+        t = self.clock.update(header['time'], time.time() if arrival is None else arrival)
+        # offset estimate may improve, keep the buffer ordered
+        if len(self.radar): t = max(t, self.radar.time(len(self.radar) - 1))
+        self.radar.append(t, frame)
+        return t
+
+    def push_camera(self, item, stamp : float) -> None:
+        # adds a camera frame with its grab time
+        self.camera.append(stamp, item)
+
+    def match(self, item, stamp : float, now : float = None):
+        """Matches one camera frame against the buffered radar frames
+        @return SyncedPair or None if no radar frame is within the tolerance
+        """
+        radar = self.radar
+        i = radar.bisect(stamp)
+        before = i - 1 if i > 0 else None
+        after = i if i < len(radar) else None
+        if self.mode == 'interpolate' and before is not None and after is not None:
+            t0, t1 = radar.time(before), radar.time(after)
+            if min(stamp - t0, t1 - stamp) <= self.tolerance:
+                weight = (stamp - t0) / (t1 - t0) if t1 > t0 else 0.0
+                return SyncedPair(item, stamp, (radar.item(before), radar.item(after)), (t0, t1), weight, now)
+            return None
+        # nearest of the two neighbours
+        best = None
+        for j in (before, after):
+            if j is not None and (best is None or abs(radar.time(j) - stamp) < abs(radar.time(best) - stamp)):
+                best = j
+        if best is None or abs(radar.time(best) - stamp) > self.tolerance:
+            return None
+        return SyncedPair(item, stamp, radar.item(best), radar.time(best), now = now)
+
+    def pop(self, now : float = None) -> list:
+        """Matches all buffered camera frames that can be decided
+        A camera frame is decided once a radar frame after it arrived or it waited max_wait.
+        @return list of SyncedPair, frames without match are counted in unmatched
+        """
+        now = time.time() if now is None else now
+        pairs = []
+        camera = self.camera
+        while len(camera):
+            stamp = camera.time(0)
+            newest = self.radar.time(len(self.radar) - 1) if len(self.radar) else None
+            if (newest is None or newest < stamp) and now - stamp < self.max_wait:
+                break
+            stamp, item = camera.popleft()
+            pair = self.match(item, stamp, now)
+            if pair is None:
+                self.unmatched += 1
+            else:
+                self.matched += 1
+                pairs.append(pair)
+        return pairs
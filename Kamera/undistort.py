@@ -1,15 +1,12 @@
 import cv2 as cv
-from utils import load_coeffs
+from utils import load_coeffs, CameraStream
 
 if __name__ == '__main__':
     # load calibration coefficients    
     coeffs = load_coeffs('wide_lense1')
 
     # configurate video capture
-    cap = cv.VideoCapture(1, cv.CAP_DSHOW)
-    cap.set(cv.CAP_PROP_FPS, 20)
-    cap.set(cv.CAP_PROP_FRAME_WIDTH, 1600)
-    cap.set(cv.CAP_PROP_FRAME_HEIGHT, 1200)
+    cap = CameraStream(1, width = 1600, height = 1200, fps = 20, api = cv.CAP_DSHOW).start()
 
 
     # display undistored image
@@ -17,10 +14,12 @@ if __name__ == '__main__':
         ret, img = cap.read()
         if not ret: break
 
-        udst = cv.undistort(img, coeffs['mtx'], coeffs['dist'], None, coeffs['newmtx'])
+        # remap with maps cached per resolution
+        udst = coeffs.undistort(img)
 
         cv.imshow("grab", udst)
         c = cv.waitKey(1)
         if c == 27: break
 
+    cap.release()
     cv.destroyAllWindows()
\ No newline at end of file
@@ -1,18 +1,58 @@
 import numpy as np
 import os
+import time
 import cv2 as cv
 import json
+import hashlib
+from threading import Thread, Condition
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
 
-def load_from_folder(path : str) -> list:
-    """Loads all images from specified folder
-    @param path : path to folder containing ONLY images
-    @return images : list of images in BGR Format
+# file types cv.imread can decode
+IMAGE_EXTENSIONS = ('.bmp', '.jpg', '.jpeg', '.jpe', '.png', '.tif', '.tiff', '.webp', '.pbm', '.pgm', '.ppm')
+
+def image_files(path : str) -> list:
+    """Lists the image files of a folder
+    @param path : folder, other files and subfolders are skipped
+    @return sorted list of paths
+    """
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(path, name))]
+
+# imread flags for (reduce, gray)
+READ_FLAGS = {
+    (1, False) : cv.IMREAD_COLOR, (1, True) : cv.IMREAD_GRAYSCALE,
+    (2, False) : cv.IMREAD_REDUCED_COLOR_2, (2, True) : cv.IMREAD_REDUCED_GRAYSCALE_2,
+    (4, False) : cv.IMREAD_REDUCED_COLOR_4, (4, True) : cv.IMREAD_REDUCED_GRAYSCALE_4,
+    (8, False) : cv.IMREAD_REDUCED_COLOR_8, (8, True) : cv.IMREAD_REDUCED_GRAYSCALE_8
+}
+
+def load_from_folder(path : str, reduce : int = 1, gray : bool = False, workers : int = 2, prefetch : int = 4):
+    """Lazily loads all images from specified folder, decoding runs ahead on a thread pool
+    @param path : path to folder, non-image files are skipped
+    @param reduce : decode at 1/reduce resolution (1, 2, 4 or 8)
+    @param gray : decode as grayscale instead of BGR
+    @param workers : decoding threads
+    @param prefetch : images decoded ahead of the consumer (bounds memory)
+    @return generator of (filename, image) in filename order, images in BGR Format
     """
-    filenames = os.listdir(path)
-    images = []
-    for filename in filenames:
-        images.append(cv.imread(os.path.join(path, filename)))
-    return images
+    flags = READ_FLAGS[(reduce, gray)]
+    files = iter(image_files(path))
+    pending = deque()
+    with ThreadPoolExecutor(workers) as pool:
+        for file in islice(files, max(prefetch, 1)):
+            pending.append((file, pool.submit(cv.imread, file, flags)))
+        while pending:
+            file, future = pending.popleft()
+            image = future.result()
+            # keep the pool busy while the consumer works on this image
+            file_next = next(files, None)
+            if file_next is not None:
+                pending.append((file_next, pool.submit(cv.imread, file_next, flags)))
+            # files with image extension that cannot be decoded
+            if image is None: continue
+            yield os.path.basename(file), image
 
 def save_coeffs(name : str, coeffs : dict):
     # dump as npz
@@ -29,21 +69,220 @@ def save_coeffs(name : str, coeffs : dict):
     with open(f'coefficients/{name}.json', 'w') as f:
         json.dump(json_coeffs, f, indent=3)
 
-def load_coeffs(name : str) -> dict:
-    return dict(np.load(f'coefficients/{name}.npz'))
-
-def project_points(data : dict, calib_params : dict) -> np.ndarray:
-    # 1. create point matrix
-    # initialize
-    num_obj = data['header']['objects']
-    points = data['detected_points']
-    point_mtx = np.zeros((3, num_obj))
-    cam_mtx = calib_params['mtx_rad']
-    # fill matrix (y from radar is z in camera coordinates)
-    point_mtx[0, :] = np.array([coords['x'] for coords in points.values()]) # X
-    point_mtx[1, :] = np.array([coords['z'] for coords in points.values()]) # Y
-    point_mtx[2, :] = np.array([coords['y'] for coords in points.values()]) # Z
-    # 2. project points (X,Y,Z) -> (u,v,Z)
-    proj = (cam_mtx @ point_mtx) # (X,Y,Z) -> (u',v',Z)
-    proj[:2, :] /= point_mtx[2,:] # (u',v',z') -> (u,v,Z)
-    return proj
\ No newline at end of file
+class Coefficients(dict):
+    """Calibration coefficients of one camera (dict of the .npz arrays) with cached undistortion maps
+    Maps are built once per (coefficients, resolution, alpha) with initUndistortRectifyMap
+    in compact fixed-point format (CV_16SC2) and stored next to the .npz
+    @param name : name of the coefficient set in coefficients/
+    """
+    def __init__(self, name : str, coeffs : dict):
+        super().__init__(coeffs)
+        self.name = name
+        # (width, height, alpha) -> (map1, map2)
+        self.maps = {}
+        # changes if the camera is calibrated again under the same name
+        self.digest = hashlib.sha1(b''.join(np.ascontiguousarray(self[k]).tobytes() for k in ('mtx', 'dist', 'newmtx'))).hexdigest()[:8]
+
+    def undistort_maps(self, size : tuple, alpha : float = None) -> tuple:
+        """Returns remap tables for images of the given size
+        @param size : (width, height) of the images
+        @param alpha : free scaling for getOptimalNewCameraMatrix, None uses the stored newmtx
+        @return (map1, map2) : CV_16SC2 maps for cv.remap
+        """
+        key = (int(size[0]), int(size[1]), alpha)
+        if key in self.maps: return self.maps[key]
+        suffix = 'newmtx' if alpha is None else f'a{alpha:g}'
+        path = f'coefficients/{self.name}_maps_{key[0]}x{key[1]}_{suffix}_{self.digest}.npz'
+        if os.path.exists(path):
+            cached = np.load(path)
+            maps = (cached['map1'], cached['map2'])
+        else:
+            if alpha is None:
+                newmtx = self['newmtx']
+            else:
+                newmtx, _ = cv.getOptimalNewCameraMatrix(self['mtx'], self['dist'], key[:2], alpha, key[:2])
+            maps = cv.initUndistortRectifyMap(self['mtx'], self['dist'], None, newmtx, key[:2], cv.CV_16SC2)
+            np.savez(path, map1 = maps[0], map2 = maps[1])
+        self.maps[key] = maps
+        return maps
+
+    def undistort(self, img : np.ndarray, alpha : float = None) -> np.ndarray:
+        """Same result as cv.undistort(img, mtx, dist, None, newmtx) with cached maps
+        @param img : distorted image
+        @param alpha : see undistort_maps
+        @return undistorted image
+        """
+        map1, map2 = self.undistort_maps(img.shape[1::-1], alpha)
+        return cv.remap(img, map1, map2, cv.INTER_LINEAR)
+
+def load_coeffs(name : str) -> Coefficients:
+    return Coefficients(name, np.load(f'coefficients/{name}.npz'))
+
+def radar_points(data) -> np.ndarray:
+    """Converts one radar frame to an (N,3) array of x, y, z
+    @param data : legacy dict, PointCloudFrame or (N,3) array
+    @return points : float64 array (N,3) in radar coordinates
+    """
+    if isinstance(data, dict):
+        # legacy dict format
+        points = data.get('detected_points', {}).values()
+        return np.array([(p['x'], p['y'], p['z']) for p in points], dtype = np.float64).reshape(-1, 3)
+    if hasattr(data, 'xyz'):
+        # PointCloudFrame columns
+        return np.asarray(data.xyz, dtype = np.float64)
+    return np.asarray(data, dtype = np.float64).reshape(-1, 3)
+
+def radar_to_camera(points : np.ndarray, R : np.ndarray = None, t : np.ndarray = None) -> np.ndarray:
+    """Transforms radar points into camera coordinates
+    @param points : (N,3) radar x (right), y (forward), z (up)
+    @param R, t : extrinsics, rotation (3,3) and translation (3,) of the radar in camera coordinates
+                  (applied after the axis swap), None for a radar mounted at the camera
+    @return (N,3) camera X (right), Y (down), Z (forward)
+    """
+    # y from radar is Z in camera coordinates, z from radar points up
+    cam = points[:, [0, 2, 1]]
+    cam[:, 1] *= -1
+    if R is not None: cam = cam @ np.asarray(R, dtype = np.float64).T
+    if t is not None: cam += np.asarray(t, dtype = np.float64).reshape(1, 3)
+    return cam
+
+def project_points(data, calib_params : dict, R : np.ndarray = None, t : np.ndarray = None, size : tuple = None,
+                   undistorted : bool = False, min_depth : float = 0.1):
+    """Projects radar points into the image in one vectorized pass
+    @param data : one frame (legacy dict, PointCloudFrame, (N,3) array) or a list of frames
+    @param calib_params : coefficients from load_coeffs
+    @param R, t : radar to camera extrinsics, see radar_to_camera
+    @param size : (width, height) of the image, points outside are culled, None keeps them
+    @param undistorted : True projects into images undistorted with newmtx (Coefficients.undistort),
+                         False into raw camera images using the distortion coefficients
+    @param min_depth : points closer than this (or behind the camera) are culled
+    @return (proj, index) : proj (3,M) with rows u, v, Z of the visible points,
+                            index (M,) of these points in the frame, a list of tuples for a list of frames
+    """
+    frames = data if isinstance(data, (list, tuple)) else [data]
+    points = [radar_points(frame) for frame in frames]
+    counts = [len(p) for p in points]
+    cam = radar_to_camera(np.concatenate(points) if points else np.empty((0, 3)), R, t)
+    # cull points behind the camera before dividing by Z
+    visible = np.flatnonzero(cam[:, 2] >= min_depth)
+    cam = cam[visible]
+    if undistorted:
+        mtx, dist = calib_params['newmtx'], None
+    else:
+        mtx, dist = calib_params['mtx'], calib_params['dist']
+    if len(cam):
+        uv = cv.projectPoints(cam.reshape(-1, 1, 3), np.zeros(3), np.zeros(3), mtx, dist)[0].reshape(-1, 2)
+    else:
+        uv = np.empty((0, 2))
+    if size is not None:
+        inside = (uv[:, 0] >= 0) & (uv[:, 0] < size[0]) & (uv[:, 1] >= 0) & (uv[:, 1] < size[1])
+        uv, cam, visible = uv[inside], cam[inside], visible[inside]
+    proj = np.vstack((uv.T, cam[:, 2])) # (u,v,Z)
+    # split back into frames, culling keeps the order
+    offsets = np.cumsum([0] + counts)
+    bounds = np.searchsorted(visible, offsets)
+    results = [(proj[:, a:b], visible[a:b] - offset) for a, b, offset in zip(bounds[:-1], bounds[1:], offsets)]
+    return results if isinstance(data, (list, tuple)) else results[0]
+
+class CameraStream():
+    """Grabs frames on a background thread and keeps only the newest one,
+    so processing always works on the latest image instead of the driver queue
+    @param source : device index, path to a video/image file or callable returning an image (synthetic)
+    @param width, height, fps : capture properties (fps also paces files and synthetic sources)
+    @param api : capture backend, e.g. cv.CAP_DSHOW
+    @param loop : restart files at the end instead of stopping
+    """
+    def __init__(self, source = 0, width : int = None, height : int = None, fps : float = None, api : int = cv.CAP_ANY, loop : bool = False):
+        self.source = source
+        self.loop = loop
+        self.cap = None
+        self.period = 1 / fps if fps else 0
+        if not callable(source):
+            self.cap = cv.VideoCapture(source, api)
+            if width is not None: self.cap.set(cv.CAP_PROP_FRAME_WIDTH, width)
+            if height is not None: self.cap.set(cv.CAP_PROP_FRAME_HEIGHT, height)
+            if fps is not None: self.cap.set(cv.CAP_PROP_FPS, fps)
+            # devices deliver at their own rate, only files need pacing
+            if isinstance(source, int): self.period = 0
+            elif not fps: self.period = 1 / (self.cap.get(cv.CAP_PROP_FPS) or 30)
+        # newest frame: (sequence number, capture time, image)
+        self.frame = None
+        self.seq = -1
+        # sequence number of the last frame handed out
+        self.last = -1
+        # frames that were replaced before anyone read them
+        self.dropped = 0
+        self.running = False
+        self.condition = Condition()
+        self.thread = None
+
+    def start(self):
+        if self.running: return self
+        self.running = True
+        self.thread = Thread(target = self._grab, name = 'camera-stream', daemon = True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None: self.thread.join()
+        self.thread = None
+        if self.cap is not None: self.cap.release()
+        with self.condition:
+            self.condition.notify_all()
+
+    def _next(self):
+        # grab one image and stamp it right after the grab
+        if self.cap is None:
+            return time.time(), self.source()
+        if not self.cap.grab():
+            if not self.loop or isinstance(self.source, int): return None, None
+            self.cap.set(cv.CAP_PROP_POS_FRAMES, 0)
+            if not self.cap.grab(): return None, None
+        stamp = time.time()
+        ret, img = self.cap.retrieve()
+        return stamp, img if ret else None
+
+    def _grab(self):
+        due = time.perf_counter()
+        while self.running:
+            stamp, img = self._next()
+            if img is None: break
+            with self.condition:
+                if self.seq > self.last: self.dropped += 1
+                self.seq += 1
+                self.frame = (self.seq, stamp, img)
+                self.condition.notify_all()
+            if self.period:
+                due += self.period
+                time.sleep(max(due - time.perf_counter(), 0))
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def latest(self, timeout : float = None):
+        """Waits for a frame that was not handed out yet
+        @param timeout : seconds to wait, None waits until the stream ends
+        @return (seq, stamp, img) or None if the stream ended or timed out
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > self.last or not self.running, timeout):
+                return None
+            if self.seq <= self.last: return None
+            self.last = self.seq
+            return self.frame
+
+    def read(self):
+        # drop-in for cv.VideoCapture.read()
+        frame = self.latest()
+        return (False, None) if frame is None else (True, frame[2])
+
+    def release(self):
+        # drop-in for cv.VideoCapture.release()
+        self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -1,58 +1,53 @@
-from ultralytics import YOLO
-from ultralytics.utils.plotting import Annotator
 import cv2 as cv
-import numpy as np
+from utils import CameraStream, Coefficients, load_coeffs
+from detection import Detector, DetectionPipeline, annotate
+from fusion import fuse, fused_labels
 
 """
 Example script for getting bounding boxes from YOLOv8
 
-Should camera interface be infinite loop or one-shot?
+one_shot() processes a single image synchronously,
+the main loop uses the pipelined detection stage (see detection.py)
 """
 
-def one_shot(cap : cv.VideoCapture, model : YOLO) -> dict:
-    # grab image from camera
+def one_shot(cap : CameraStream, model : Detector, coeffs : Coefficients = None, radar = None) -> dict:
+    # newest image from camera, older ones were dropped by the grabber
     ret, img = cap.read()
     if ret is False: return None
-    # TODO: undistort image
+    # undistort image with cached remap tables
+    if coeffs is not None: img = coeffs.undistort(img)
 
-    # get yolo prediction
-    results = model.predict(img, verbose = False)
+    # get yolo prediction, boxes (N, 6): x1, y1, x2, y2, cls, conf
+    boxes = model([img])[0]
+    # label boxes with distance and velocity of the radar points inside
+    fused, labels = None, None
+    if radar is not None and coeffs is not None:
+        fused = fuse(radar, boxes, coeffs, img.shape[1::-1])
+        labels = fused_labels(fused)
     # annotate image with results
-    coords = []
-    for r in results:
-        annotator = Annotator(img)
-        boxes = r.boxes
-        for box in boxes:
-            b = box.xyxy[0]
-            coords.append(b.numpy().astype(np.uint16))
-            c = box.cls
-            # label with distance, veloctiy, ... could be added here
-            # TODO: 
-            label = f'{model.names[int(c)]}'
-            annotator.box_label(b, label, color = (255,0,0))
     annotated = {
-        'img' : annotator.result(),
-        'xyxy' : coords
+        'img' : annotate(img, boxes, model.names, labels),
+        'boxes' : boxes,
+        'fused' : fused
     }
     return annotated
 
 if __name__ == '__main__':
-    # initialize object detection model
-    model = YOLO('yolov8n.pt')
+    # initialize object detection model, backend = 'openvino' is usually faster on cpu
+    model = Detector('yolov8n.pt', imgsz = 640)
+    # calibration of the camera
+    coeffs = load_coeffs('wide_lense1')
     # init camera
-    cap = cv.VideoCapture(1, cv.CAP_DSHOW) # change to correct camera port
-    cap.set(cv.CAP_PROP_FRAME_HEIGHT, 720)
-    cap.set(cv.CAP_PROP_FRAME_WIDTH, 1280)
+    cap = CameraStream(1, width = 1280, height = 720, api = cv.CAP_DSHOW) # change to correct camera port
 
-    # capture loop
-    while True:
-        annotated = one_shot(cap, model)
-        if annotated is not None:
+    # capture loop, capture/undistortion/inference/annotation run in parallel
+    with DetectionPipeline(cap, model, coeffs) as pipeline:
+        for annotated in pipeline.results():
             # display annotated image
             cv.imshow('Detection', annotated['img'])
             # check for loop end
-            key = cv.waitKey(1) 
+            key = cv.waitKey(1)
             if key == 27: break
-    # cleanup
-    cap.release()
-    cv.destroyAllWindows()
\ No newline at end of file
+        # cleanup
+        print(f'Dropped {cap.dropped} camera frames, {pipeline.dropped} in the pipeline')
+    cv.destroyAllWindows()
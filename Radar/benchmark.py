@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+from time import perf_counter_ns
+from argparse import ArgumentParser, Namespace
+from interface.radar import Radar
+from interface.synthetic import synthetic_stream
+
+"""
+Benchmark for reader and parser of the radar interface with synthetic frames.
+
+Reports frames/s, MB/s and p50/p99 latency per frame for several point counts and
+compares the median latency with a stored baseline (exit code 1 on regression).
+
+Usage:
+    python benchmark.py --points 0 32 256 --range_bins 256 --doppler_bins 16
+    python benchmark.py --save   # store current numbers as baseline
+"""
+
+def measure(step, frames : int, size : int) -> dict:
+    # run step once per frame and collect latencies
+    latency = np.empty(frames, dtype = np.int64)
+    for i in range(frames):
+        start = perf_counter_ns()
+        step()
+        latency[i] = perf_counter_ns() - start
+    total = latency.sum() / 1e9
+    return {
+        'fps' : frames / total,
+        'mbps' : size / total / 1e6,
+        'p50_ms' : np.percentile(latency, 50) / 1e6,
+        'p99_ms' : np.percentile(latency, 99) / 1e6
+    }
+
+def run(args : Namespace) -> dict:
+    results = {}
+    shape = {'range_bins' : args.range_bins, 'doppler_bins' : args.doppler_bins, 'azimuth_antennas' : args.azimuth_antennas}
+    with tempfile.TemporaryDirectory() as tmp:
+        for points in args.points:
+            # capture with synthetic frames, replayed unthrottled
+            stream = synthetic_stream(args.frames, junk = args.junk, points = points, **shape)
+            path = os.path.join(tmp, f'{points}.bin')
+            with open(path, 'wb') as f:
+                f.write(stream)
+            radar = Radar.replay(path, speed = 0, as_dict = False)
+            frames = []
+            results[f'read/{points}'] = measure(lambda: frames.append(radar.read_frame()), args.frames, len(stream))
+            for as_dict in (False, True):
+                radar.as_dict = as_dict
+                it = iter(frames)
+                name = 'parse_dict' if as_dict else 'parse'
+                results[f'{name}/{points}'] = measure(lambda: radar.parse(next(it)), args.frames, len(stream))
+            del frames, radar
+    return results
+
+def compare(results : dict, baseline : dict, tolerance : float) -> bool:
+    # print table, flag cases slower than baseline
+    ok = True
+    print(f'{"case":<20}{"frames/s":>12}{"MB/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"base p50":>10}')
+    for case, r in results.items():
+        # median is robust against scheduler noise
+        ref = baseline.get(case, {}).get('p50_ms')
+        flag = ''
+        if ref is not None and r['p50_ms'] > ref * (1 + tolerance):
+            flag = '  REGRESSION'
+            ok = False
+        ref = f'{ref:10.3f}' if ref is not None else f'{"-":>10}'
+        print(f'{case:<20}{r["fps"]:12.0f}{r["mbps"]:10.1f}{r["p50_ms"]:10.3f}{r["p99_ms"]:10.3f}{ref}{flag}')
+    return ok
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--frames', help = 'Frames per case', default = 500, type = int)
+    parser.add_argument('--points', help = 'Detected points per frame', default = [0, 32, 256], type = int, nargs = '+')
+    parser.add_argument('--range_bins', help = 'Range bins of profiles and heatmaps', default = 256, type = int)
+    parser.add_argument('--doppler_bins', help = 'Doppler bins of range-doppler heatmap', default = 16, type = int)
+    parser.add_argument('--azimuth_antennas', help = 'Virtual antennas of range-azimuth heatmap', default = 4, type = int)
+    parser.add_argument('--junk', help = 'Garbage bytes between frames', default = 0, type = int)
+    parser.add_argument('--baseline', help = 'Baseline file', default = 'benchmark_baseline.json')
+    parser.add_argument('--tolerance', help = 'Allowed relative slowdown', default = 0.3, type = float)
+    parser.add_argument('--save', help = 'Store results as baseline', action = 'store_true')
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    ok = compare(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent = 3)
+    sys.exit(0 if ok or args.save else 1)
@@ -0,0 +1,154 @@
+import asyncio
+from serial import Serial
+from .radar_config import COMMANDS, load_cfg, reply_status, RadarConfigError
+from .decoder import FrameDecoder, to_dict
+from .frame import PointCloudFrame
+from .framing import FrameBuffer
+from .layout import FrameLayout
+
+"""
+asyncio interface for the radar
+
+Both serial ports are opened non-blocking and registered with loop.add_reader,
+so one event loop can serve several sensors (and e.g. the camera pipeline)
+without extra threads. Needs a selector based event loop and serial ports
+with a file descriptor (Linux/macOS).
+
+Usage:
+    async with AsyncRadar(com) as radar:
+        async for frame in radar:
+            ...
+"""
+
+class AsyncRadar():
+    def __init__(self, com : dict, as_dict : bool = False, maxsize : int = 8, cfg : str = None):
+        self.com = com
+        # commands and expected frame layout
+        self.commands = COMMANDS if cfg is None else load_cfg(cfg)
+        self.layout = FrameLayout(self.commands)
+        # non-blocking serial ports
+        self.conf = Serial(com['conf_port'], baudrate = com['conf_baud'], timeout = 0)
+        self.data = Serial(com['data_port'], baudrate = com['data_baud'], timeout = 0)
+        # splits bytestream into frames
+        self.stream = FrameBuffer(layout = self.layout)
+        # decoder for tlv frames
+        self.decoder = FrameDecoder(self.layout.shapes, pool = maxsize + 2)
+        # convert output to legacy dict format
+        self.as_dict = as_dict
+        # decoded frames, oldest frame is dropped if consumer is too slow
+        self.frames = asyncio.Queue(maxsize)
+        self.dropped = 0
+        # lines received on config port
+        self.lines = asyncio.Queue()
+        self.line_buffer = bytearray()
+        self.loop = None
+
+    async def open(self, configure : bool = True):
+        """
+        Registers both ports with the running event loop and configures the sensor.
+
+        Args:
+        - configure: bool - If True, uploads the config commands (which start the sensor).
+        """
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.conf.fileno(), self._on_conf)
+        self.loop.add_reader(self.data.fileno(), self._on_data)
+        if configure:
+            await self.command(b'configDataPort 921600 1\n')
+            await self.configure()
+
+    async def close(self):
+        # stop radar, unregister and close serial ports
+        if self.loop is not None:
+            try:
+                await self.command(b'sensorStop\n')
+            except RadarConfigError as e:
+                print(e)
+            self.loop.remove_reader(self.conf.fileno())
+            self.loop.remove_reader(self.data.fileno())
+            self.loop = None
+            # end marker for async for
+            if self.frames.full():
+                self.frames.get_nowait()
+                self.dropped += 1
+            self.frames.put_nowait(None)
+        self.conf.close()
+        self.data.close()
+
+    async def command(self, command : bytes, timeout : float = 1.0) -> list:
+        """
+        Sends one CLI command and waits for its reply.
+
+        Args:
+        - command: bytes - Command terminated with newline.
+        - timeout: float - Seconds to wait for 'Done' or 'Error'.
+
+        Returns:
+        - list - Received lines up to 'Done'.
+
+        Raises:
+        - RadarConfigError - On 'Error' or if no 'Done' arrives within timeout.
+        """
+        # discard stale replies
+        while not self.lines.empty():
+            self.lines.get_nowait()
+        self.conf.write(command)
+        lines = []
+        deadline = self.loop.time() + timeout
+        while True:
+            try:
+                line = await asyncio.wait_for(self.lines.get(), deadline - self.loop.time())
+            except asyncio.TimeoutError:
+                raise RadarConfigError(command, lines or [b'no reply'])
+            lines.append(line)
+            status = reply_status(line)
+            if status == 'done':
+                return lines
+            if status == 'error':
+                raise RadarConfigError(command, lines)
+
+    async def configure(self, commands : list = None):
+        # execute each command in sequence
+        await self.command(b'sensorStop\n')
+        for command in self.commands if commands is None else commands:
+            await self.command(command)
+
+    def _on_conf(self):
+        # split config port bytes into lines
+        self.line_buffer += self.conf.read(self.conf.in_waiting or 1)
+        *lines, rest = self.line_buffer.split(b'\n')
+        self.line_buffer = bytearray(rest)
+        for line in lines:
+            line = line.strip()
+            if line: self.lines.put_nowait(line)
+
+    def _on_data(self):
+        # feed data port bytes and queue every complete frame
+        self.stream.feed(self.data.read(self.data.in_waiting or 1))
+        while True:
+            frame = self.stream.next_frame()
+            if frame is None: break
+            output = self.decoder(frame)
+            output = to_dict(output) if self.as_dict else PointCloudFrame.from_decoded(output)
+            if self.frames.full():
+                self.frames.get_nowait()
+                self.dropped += 1
+            self.frames.put_nowait(output)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.frames.get()
+        if frame is None:
+            # keep the marker for other consumers
+            self.frames.put_nowait(None)
+            raise StopAsyncIteration
+        return frame
@@ -0,0 +1,149 @@
+import os
+import time
+import mmap
+import numpy as np
+from struct import Struct
+
+"""
+Module for recording and replaying the raw data UART bytestream.
+
+A capture consists of two files:
+- <path>: every byte read from the data port, unchanged
+- <path>.idx: one fixed size record per complete frame (see INDEX_DTYPE)
+
+Classes:
+- Recorder:
+    Writes the bytestream and the frame index, attached with Radar.record().
+
+- ReplaySerial:
+    Serial stand-in that memory-maps a capture and feeds it to Radar in real time,
+    scaled time or as fast as possible. Frames can be accessed by number via the index.
+"""
+
+# index record: stream offset, frame length, header number, host timestamp
+INDEX = Struct('<QIId')
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4'), ('number', '<u4'), ('time', '<f8')])
+# offset of the frame number in the header
+NUMBER_OFFSET = 20
+
+class Recorder():
+    def __init__(self, path : str, base : int = 0):
+        # raw bytestream and sidecar index
+        self.raw = open(path, 'wb')
+        self.index = open(path + '.idx', 'wb')
+        # stream offset of the first recorded byte
+        self.base = base
+        self.frames = 0
+
+    def write(self, data) -> None:
+        # append raw bytes
+        self.raw.write(data)
+
+    def mark(self, offset : int, frame : bytes) -> None:
+        """
+        Adds one frame to the index.
+
+        Args:
+        - offset: int - Stream offset of the frame (FrameBuffer.offset).
+        - frame: bytes - The complete frame.
+        """
+        number = int.from_bytes(frame[NUMBER_OFFSET:NUMBER_OFFSET + 4], 'little')
+        self.index.write(INDEX.pack(offset - self.base, len(frame), number, time.time()))
+        self.frames += 1
+
+    def close(self) -> None:
+        self.raw.close()
+        self.index.close()
+
+class ReplaySerial():
+    def __init__(self, path : str, speed : float = 1.0, timeout : float = None):
+        """
+        Args:
+        - path: str - Raw capture written by Recorder.
+        - speed: float - 1.0 real time, 2.0 twice as fast, 0 or None unthrottled.
+        - timeout: float - Like Serial.timeout, None blocks (raises EOFError at the end).
+        """
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        # frame index, empty if the sidecar is missing
+        index = path + '.idx'
+        self.index = np.fromfile(index, dtype = INDEX_DTYPE) if os.path.exists(index) else np.zeros(0, INDEX_DTYPE)
+        self.ends = self.index['offset'] + self.index['length']
+        self.speed = speed
+        self.timeout = timeout
+        self.position = 0
+        self.restart()
+
+    def __len__(self):
+        return len(self.index)
+
+    def restart(self) -> None:
+        # align replay clock with the frame at the current position
+        first = min(np.searchsorted(self.ends, self.position, side = 'right'), max(len(self.index) - 1, 0))
+        self.clock = (time.perf_counter(), self.index['time'][first] if len(self.index) else 0.0)
+
+    def available(self) -> int:
+        # stream offset up to which bytes have "arrived"
+        if not self.speed or not len(self.index):
+            return len(self.map)
+        start, recorded = self.clock
+        now = recorded + (time.perf_counter() - start) * self.speed
+        k = np.searchsorted(self.index['time'], now, side = 'right')
+        return len(self.map) if k >= len(self.index) else int(self.ends[k - 1]) if k else 0
+
+    @property
+    def in_waiting(self) -> int:
+        return max(self.available() - self.position, 0)
+
+    def inWaiting(self) -> int:
+        return self.in_waiting
+
+    def read(self, size : int = 1) -> bytes:
+        """
+        Reads up to size bytes, waits for the replay clock like a serial port would.
+        """
+        end = min(self.position + size, len(self.map))
+        if self.timeout is None and self.position >= len(self.map):
+            raise EOFError('end of capture')
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while self.available() < end:
+            if deadline is not None and time.perf_counter() >= deadline:
+                end = max(self.available(), self.position)
+                break
+            time.sleep(0.001)
+        if self.position >= len(self.map) and self.timeout:
+            # end of capture, behave like an idle port
+            time.sleep(self.timeout)
+        data = self.map[self.position:end]
+        self.position = end
+        return data
+
+    def seek_frame(self, number : int) -> None:
+        """
+        Moves the replay to the frame with header number, uses the index.
+        """
+        self.position = int(self.index['offset'][self.find(number)])
+        self.restart()
+
+    def find(self, number : int) -> int:
+        # frame numbers increase monotonically, binary search in index
+        k = int(np.searchsorted(self.index['number'], number))
+        if k >= len(self.index) or self.index['number'][k] != number:
+            raise KeyError(f'Frame {number} not in capture')
+        return k
+
+    def frame(self, number : int) -> memoryview:
+        """
+        Returns the raw frame with header number without moving the replay.
+        The view is valid until close().
+        """
+        k = self.find(number)
+        return memoryview(self.map)[int(self.index['offset'][k]):int(self.ends[k])]
+
+    def close(self) -> None:
+        try:
+            self.map.close()
+        except BufferError:
+            # frames returned by frame() are still in use, map is released with them
+            pass
+        self.file.close()
@@ -0,0 +1,143 @@
+import numpy as np
+
+"""
+DBSCAN-style clustering of radar point clouds with a uniform spatial hash.
+
+Coordinates are scaled so that eps becomes 1 in every dimension (x, y, z and optionally Doppler),
+so all neighbours of a point lie in the 3^d grid cells around its own cell. Points are sorted
+by cell key once, the neighbour cells of all points are looked up with searchsorted, and only
+those candidate pairs get an exact distance test. The cost grows with the number of close pairs
+instead of N^2.
+
+Core points (at least min_samples neighbours including themselves) that are neighbours form
+one cluster, border points join the cluster of a core neighbour, the rest is noise (label -1).
+
+Classes:
+- PointClusterer:
+    Clusters the points of one frame and returns labels, centroids, extents and member counts.
+"""
+
+def neighbour_pairs(features : np.ndarray) -> tuple:
+    """
+    Finds all pairs of points with euclidean distance <= 1 (including (i, i)).
+
+    Args:
+    - features: np.ndarray - (N, d) scaled coordinates.
+
+    Returns:
+    - tuple - (i, j) index arrays, every pair appears in both directions.
+    """
+    n, d = features.shape
+    cells = np.floor(features).astype(np.int64)
+    cells -= cells.min(axis = 0) - 1
+    # mixed radix key without collisions, one spare cell on each side for the neighbours
+    sizes = cells.max(axis = 0) + 2
+    strides = np.cumprod(np.r_[1, sizes[:-1]])
+    keys = cells @ strides
+    order = np.argsort(keys, kind = 'stable')
+    sorted_keys = keys[order]
+    # keys of the 3^d neighbour cells
+    offsets = np.stack(np.meshgrid(*[(-1, 0, 1)] * d, indexing = 'ij'), -1).reshape(-1, d) @ strides
+    neighbours = keys[:, None] + offsets[None, :]
+    lo = np.searchsorted(sorted_keys, neighbours, 'left').ravel()
+    hi = np.searchsorted(sorted_keys, neighbours, 'right').ravel()
+    counts = hi - lo
+    total = int(counts.sum())
+    # expand the slices into candidate pairs
+    i = np.repeat(np.repeat(np.arange(n), len(offsets)), counts)
+    starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+    j = order[np.arange(total) + starts]
+    diff = features[i] - features[j]
+    close = np.einsum('ij,ij->i', diff, diff) <= 1.0
+    return i[close], j[close]
+
+def _components(n : int, i : np.ndarray, j : np.ndarray) -> np.ndarray:
+    # connected components by min-label propagation with pointer jumping
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        previous = labels.copy()
+        np.minimum.at(labels, i, low)
+        np.minimum.at(labels, j, low)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+class PointClusterer():
+    def __init__(self, eps : float = 0.5, min_samples : int = 3, doppler_eps : float = None):
+        """
+        Args:
+        - eps: float - Neighbourhood radius in m.
+        - min_samples: int - Neighbours (including the point) needed for a core point.
+        - doppler_eps: float - Doppler difference in m/s that counts as much as eps, None ignores Doppler.
+        """
+        self.eps = eps
+        self.min_samples = min_samples
+        self.doppler_eps = doppler_eps
+
+    def labels(self, positions : np.ndarray, doppler : np.ndarray = None) -> np.ndarray:
+        """
+        Cluster label of every point, -1 for noise.
+
+        Args:
+        - positions: np.ndarray - (N, 3) x, y, z.
+        - doppler: np.ndarray - (N,) radial velocities, only used with doppler_eps.
+
+        Returns:
+        - np.ndarray - (N,) labels 0..K-1 ordered by first point, -1 for noise.
+        """
+        positions = np.asarray(positions, dtype = np.float64).reshape(-1, 3)
+        n = len(positions)
+        if not n: return np.zeros(0, dtype = np.int64)
+        features = positions / self.eps
+        if self.doppler_eps is not None and doppler is not None:
+            features = np.column_stack((features, np.asarray(doppler, dtype = np.float64) / self.doppler_eps))
+        i, j = neighbour_pairs(features)
+        core = np.bincount(i, minlength = n) >= self.min_samples
+        # clusters are connected core points
+        both = core[i] & core[j]
+        roots = _components(n, i[both], j[both])
+        labels = np.where(core, roots, -1)
+        # border points take the root of a core neighbour
+        border = ~core[i] & core[j]
+        labels[i[border]] = roots[j[border]]
+        # consecutive labels
+        clustered = labels >= 0
+        _, labels[clustered] = np.unique(labels[clustered], return_inverse = True)
+        return labels
+
+    def __call__(self, frame) -> dict:
+        """
+        Clusters the points of a PointCloudFrame (or anything with x, y, z, doppler and optional snr columns).
+
+        Returns:
+        - dict - 'labels' (N,) cluster of every point (-1 noise), per cluster (K,):
+                 'centroid' (K, 3), 'min' / 'max' (K, 3) bounding box, 'extent' (K, 3) size,
+                 'doppler' (K,) mean radial velocity, 'count' (K,) number of points,
+                 'snr' (K,) sum of the SNR of the members if the frame has SNR.
+        """
+        positions = np.column_stack((frame.x, frame.y, frame.z)).astype(np.float64)
+        doppler = np.asarray(frame.doppler, dtype = np.float64)
+        labels = self.labels(positions, doppler)
+        members = labels >= 0
+        k = int(labels.max()) + 1 if members.any() else 0
+        index = labels[members]
+        count = np.bincount(index, minlength = k)
+        centroid = np.stack([np.bincount(index, positions[members, c], k) for c in range(3)], 1) / np.maximum(count, 1)[:, None]
+        low = np.full((k, 3), np.inf)
+        high = np.full((k, 3), -np.inf)
+        np.minimum.at(low, index, positions[members])
+        np.maximum.at(high, index, positions[members])
+        clusters = {
+            'labels' : labels,
+            'centroid' : centroid,
+            'min' : low,
+            'max' : high,
+            'extent' : high - low,
+            'doppler' : np.bincount(index, doppler[members], k) / np.maximum(count, 1),
+            'count' : count
+        }
+        snr = getattr(frame, 'snr', None)
+        if snr is not None:
+            clusters['snr'] = np.bincount(index, np.asarray(snr, dtype = np.float64)[members], k)
+        return clusters
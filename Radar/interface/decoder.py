@@ -0,0 +1,211 @@
+import numpy as np
+from struct import Struct
+from .utility import bcd, q_to_db_array
+
+"""
+Module for decoding TLV frames of the mmWave SDK 3.6 out of the box demo.
+
+The header is unpacked with one precompiled Struct, every TLV payload is mapped
+as a NumPy view into the frame buffer (no copies, no per-element Python work).
+
+Range and noise profiles are converted to dB into reused float32 buffers.
+If the heatmap shapes of the active config are known (radar_config.heatmap_shapes),
+the range-doppler heatmap is returned as 2-D view and the complex range-azimuth
+heatmap is decoded in one pass into preallocated complex64 buffers. These buffers
+are reused round robin, a frame's profiles and heatmaps are valid until 'pool'
+more frames are decoded.
+
+Classes:
+- FrameDecoder:
+    Decodes one frame into a dict of header and NumPy views.
+
+Functions:
+- to_dict(frame: dict) -> dict:
+    Converts a decoded frame into the legacy dict format of Radar.parse.
+"""
+
+# frame header: magic, version, length, platform, number, time, objects, blocks, subframe
+HEADER = Struct('<8s8I')
+# tlv header: type, length
+TLV_HEADER = Struct('<2I')
+
+# dtypes of tlv payloads
+POINT_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('v', '<f4')])
+SIDE_INFO_DTYPE = np.dtype([('snr', '<u2'), ('noise', '<u2')])
+PROFILE_DTYPE = np.dtype('<u2')
+# range-azimuth: complex int16 (imag, real), range-doppler: uint16
+AZIMUTH_DTYPE = np.dtype('<i2')
+DOPPLER_DTYPE = np.dtype('<u2')
+STATS_DTYPE = np.dtype([
+    ('interframe_processing', '<u4'),
+    ('transmit_output', '<u4'),
+    ('interframe_margin', '<u4'),
+    ('interchirp_margin', '<u4'),
+    ('active_frame_load', '<u4'),
+    ('interframe_load', '<u4')
+])
+
+class FrameDecoder():
+    # dict for tlv types
+    indices = {
+        1: 'detected_points',
+        2: 'range_profile',
+        3: 'noise_profile',
+        4: 'azimuth_static',
+        5: 'range_doppler',
+        6: 'stats',
+        7: 'side_info'
+    }
+    # dtype of each tlv type
+    dtypes = {
+        1: POINT_DTYPE,
+        2: PROFILE_DTYPE,
+        3: PROFILE_DTYPE,
+        4: AZIMUTH_DTYPE,
+        5: DOPPLER_DTYPE,
+        6: STATS_DTYPE,
+        7: SIDE_INFO_DTYPE
+    }
+
+    def __init__(self, shapes: dict = None, pool: int = 2):
+        """
+        Args:
+        - shapes: dict - Heatmap shapes, see radar_config.heatmap_shapes. None keeps flat views.
+        - pool: int - Number of reused output buffers per heatmap.
+        """
+        self.shapes = {} if shapes is None else dict(shapes)
+        self.pool = pool
+        self.buffers = {}
+        self.next = 0
+
+    def buffer(self, block: str, shape: tuple, dtype) -> np.ndarray:
+        """
+        Returns the next reusable output buffer for block.
+        """
+        buffers = self.buffers.get(block)
+        if buffers is None or len(buffers) != self.pool or buffers[0].shape != shape:
+            buffers = self.buffers[block] = [np.empty(shape, dtype) for _ in range(self.pool)]
+        return buffers[self.next % self.pool]
+
+    def profile(self, block: str, data: np.ndarray) -> np.ndarray:
+        """
+        Converts a range or noise profile from Q9 to dB in one vectorized call.
+        """
+        return q_to_db_array(data, out = self.buffer(block, data.shape, np.float32))
+
+    def heatmap(self, block: str, data: np.ndarray) -> np.ndarray:
+        """
+        Reshapes heatmap payloads according to the config, unknown sizes stay flat.
+        """
+        shape = self.shapes.get(block)
+        if block == 'azimuth_static':
+            if shape is None or data.size != 2 * shape[0] * shape[1]: return data
+            out = self.buffer(block, shape, np.complex64)
+            # (imag, real) int16 pairs -> (real, imag) float32 pairs in one copy
+            np.copyto(out.view(np.float32).reshape(-1, 2), data.reshape(-1, 2)[:, ::-1])
+            return out
+        if shape is None or data.size != shape[0] * shape[1]: return data
+        return data.reshape(shape)
+
+    def header(self, buffer, offset: int = 0) -> dict:
+        """
+        Unpacks the frame header.
+
+        Args:
+        - buffer: bytes-like - Buffer starting with the magic word at offset.
+        - offset: int - Position of the header in buffer.
+
+        Returns:
+        - dict - Header meta data.
+        """
+        magic, version, length, platform, number, time, objects, blocks, subframe = HEADER.unpack_from(buffer, offset)
+        return {
+            'magic' : magic,
+            'version' : bcd(version),
+            'length' : length,
+            'platform' : bcd(platform),
+            'number' : number,
+            'time' : time,
+            'objects' : objects,
+            'blocks' : blocks,
+            'subframe' : subframe
+        }
+
+    def __call__(self, buffer) -> dict:
+        """
+        Decodes one frame. All payloads are read-only views into buffer,
+        so buffer must not be modified while the result is in use.
+
+        Args:
+        - buffer: bytes-like - One complete frame starting with the magic word.
+
+        Returns:
+        - dict - 'header' and one NumPy array per TLV type found in the frame.
+        """
+        output = {'header' : self.header(buffer)}
+        offset = HEADER.size
+        end = len(buffer)
+        for _ in range(output['header']['blocks']):
+            if offset + TLV_HEADER.size > end: break
+            address, values = TLV_HEADER.unpack_from(buffer, offset)
+            offset += TLV_HEADER.size
+            # skip unknown tlv types and truncated payloads
+            dtype = self.dtypes.get(address)
+            if dtype is not None and offset + values <= end:
+                block = self.indices[address]
+                output[block] = np.frombuffer(buffer, dtype, values // dtype.itemsize, offset)
+                if address in (2, 3): output[block] = self.profile(block, output[block])
+                if address in (4, 5): output[block] = self.heatmap(block, output[block])
+            offset += values
+        self.next += 1
+        return output
+
+def to_dict(frame: dict) -> dict:
+    """
+    Converts a decoded frame into the legacy dict format of Radar.parse
+    (points and side info keyed by 'i,i', profiles in dB as lists).
+
+    Args:
+    - frame: dict - Output of FrameDecoder.
+
+    Returns:
+    - dict - Frame in legacy format.
+    """
+    output = {'header' : frame['header']}
+    if 'detected_points' in frame:
+        points = frame['detected_points']
+        output['detected_points'] = {
+            f'{i},{i}' : {'v' : v, 'x' : x, 'y' : y, 'z' : z}
+            for i, (x, y, z, v) in enumerate(points.tolist())
+        }
+    for block in ('range_profile', 'noise_profile'):
+        if block in frame:
+            output[block] = frame[block].tolist()
+    if 'azimuth_static' in frame:
+        heatmap = frame['azimuth_static']
+        if np.iscomplexobj(heatmap):
+            # back to interleaved (imag, real) values
+            heatmap = np.stack((heatmap.imag, heatmap.real), -1).astype(np.int16)
+        output['azimuth_static'] = heatmap.ravel().tolist()
+    if 'range_doppler' in frame:
+        # the legacy parser read the uint16 values as int16, keep its values
+        output['range_doppler'] = frame['range_doppler'].astype(np.int16).ravel().tolist()
+    if 'stats' in frame and len(frame['stats']):
+        ifpt, tot, ifpm, icpm, afpl, ifpl = frame['stats'][0].tolist()
+        output['stats'] = {
+            'interframe_processing' : ifpt,
+            'transmit_output': tot,
+            'processing_margin': {
+                'interframe': ifpm,
+                'interchirp': icpm},
+            'cpu_load': {
+                'active_frame': afpl,
+                'interframe': ifpl}
+        }
+    if 'side_info' in frame:
+        side_info = frame['side_info']
+        output['side_info'] = {
+            f'{i},{i}' : {'snr' : snr, 'noise' : noise}
+            for i, (snr, noise) in enumerate(side_info.tolist())
+        }
+    return output
@@ -0,0 +1,87 @@
+import numpy as np
+from .decoder import to_dict
+
+"""
+Columnar result type of the radar interface.
+
+Classes:
+- PointCloudFrame:
+    Header meta data and one contiguous NumPy column per point attribute
+    (x, y, z, doppler, snr, noise). Other TLVs stay available in 'blocks'
+    (pooled arrays, only valid for FrameDecoder.pool frames).
+"""
+
+class PointCloudFrame():
+    __slots__ = ('header', 'x', 'y', 'z', 'doppler', 'snr', 'noise', 'blocks')
+
+    def __init__(self, header : dict, points : np.ndarray = None, side_info : np.ndarray = None, blocks : dict = None):
+        """
+        Args:
+        - header: dict - Frame header.
+        - points: np.ndarray - Structured array with fields x, y, z, v (decoder.POINT_DTYPE).
+        - side_info: np.ndarray - Structured array with fields snr, noise, None if not sent.
+        - blocks: dict - Remaining decoded TLVs (profiles, heatmaps, stats).
+          Profiles and heatmaps live in the decoder's buffer pool and are overwritten after
+          FrameDecoder.pool frames, .copy() them if frames are kept longer.
+        """
+        self.header = header
+        if points is None:
+            points = np.zeros(0, [('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('v', '<f4')])
+        # copy strided fields into contiguous columns
+        self.x = np.ascontiguousarray(points['x'])
+        self.y = np.ascontiguousarray(points['y'])
+        self.z = np.ascontiguousarray(points['z'])
+        self.doppler = np.ascontiguousarray(points['v'])
+        if side_info is None:
+            self.snr = self.noise = None
+        else:
+            self.snr = np.ascontiguousarray(side_info['snr'])
+            self.noise = np.ascontiguousarray(side_info['noise'])
+        self.blocks = {} if blocks is None else blocks
+
+    @classmethod
+    def from_decoded(cls, frame : dict):
+        # build from output of FrameDecoder
+        blocks = {key : value for key, value in frame.items() if key not in ('header', 'detected_points', 'side_info')}
+        return cls(frame['header'], frame.get('detected_points'), frame.get('side_info'), blocks)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __repr__(self) -> str:
+        return f'PointCloudFrame(number={self.header.get("number")}, points={len(self)}, blocks={list(self.blocks)})'
+
+    @property
+    def xyz(self) -> np.ndarray:
+        # (N, 3) array of point coordinates
+        return np.column_stack((self.x, self.y, self.z))
+
+    def to_dict(self) -> dict:
+        """
+        Converts to the legacy dict format of Radar.parse.
+        """
+        output = to_dict({'header' : self.header, **self.blocks})
+        if len(self):
+            output['detected_points'] = {
+                f'{i},{i}' : {'v' : v, 'x' : x, 'y' : y, 'z' : z}
+                for i, (x, y, z, v) in enumerate(zip(self.x.tolist(), self.y.tolist(), self.z.tolist(), self.doppler.tolist()))
+            }
+        if self.snr is not None:
+            output['side_info'] = {
+                f'{i},{i}' : {'snr' : snr, 'noise' : noise}
+                for i, (snr, noise) in enumerate(zip(self.snr.tolist(), self.noise.tolist()))
+            }
+        return output
+
+    def to_dataframe(self):
+        """
+        Converts the points to a pandas DataFrame, header is stored in DataFrame.attrs.
+        """
+        import pandas as pd
+        columns = {'x' : self.x, 'y' : self.y, 'z' : self.z, 'doppler' : self.doppler}
+        if self.snr is not None:
+            columns['snr'] = self.snr
+            columns['noise'] = self.noise
+        df = pd.DataFrame(columns, copy = False)
+        df.attrs = dict(self.header)
+        return df
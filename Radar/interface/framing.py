@@ -0,0 +1,129 @@
+import warnings
+from .decoder import HEADER
+
+"""
+Module for splitting the data UART bytestream into frames.
+
+The bytestream is collected in one reusable bytearray. The magic word is searched
+with bytearray.find at any offset, afterwards the header 'length' field tells how
+many bytes are still missing, so the rest of the packet can be read at once.
+Bytes behind a frame stay in the buffer for the next one.
+With a FrameLayout the length field is checked against the config in O(1),
+headers that do not match are treated as false magic words. If max_rejections headers in a
+row do not match, the layout is assumed to be wrong for this board/config: a warning with the
+expected and received length is issued once and any sane length is accepted from then on.
+
+Classes:
+- FrameBuffer:
+    Accumulates bytes and pops complete frames.
+"""
+
+# sync word at the start of every frame
+MAGIC_WORD = b'\x02\x01\x04\x03\x06\x05\x08\x07'
+# offset of the total packet length and number of objects in the header
+LENGTH_OFFSET = 12
+OBJECTS_OFFSET = 28
+
+class FrameBuffer():
+    def __init__(self, max_length : int = 1 << 20, layout = None, max_rejections : int = 8):
+        # reusable buffer for bytestream
+        self.buffer = bytearray()
+        # length of the frame at the start of buffer, 0 while unknown
+        self.length = 0
+        # upper bound for sane header lengths
+        self.max_length = max_length
+        # expected frame layout (FrameLayout), None accepts any sane length
+        self.layout = layout
+        # consecutive rejected headers until the layout check is given up
+        self.max_rejections = max_rejections
+        self.consecutive = 0
+        self.layout_failed = False
+        # stream offset of buffer[0]
+        self.position = 0
+        # stream offset of the last popped frame
+        self.offset = 0
+        # sync statistics
+        self.resyncs = 0
+        self.discarded = 0
+        self.rejected = 0
+
+    def feed(self, data) -> None:
+        """
+        Appends bytes read from the data port.
+        """
+        self.buffer += data
+
+    def missing(self) -> int:
+        """
+        Returns the number of bytes needed before the next frame can be complete.
+        """
+        if self.length:
+            return max(self.length - len(self.buffer), 1)
+        return max(HEADER.size - len(self.buffer), 1)
+
+    def discard(self, n : int) -> None:
+        """
+        Drops n bytes from the start of buffer.
+        """
+        if n <= 0: return
+        del self.buffer[:n]
+        self.position += n
+        self.discarded += n
+        self.resyncs += 1
+
+    def sync(self) -> bool:
+        """
+        Moves the next magic word to the start of buffer and reads the frame length.
+
+        Returns:
+        - bool - True if the length of the next frame is known.
+        """
+        buffer = self.buffer
+        while not self.length:
+            index = buffer.find(MAGIC_WORD)
+            if index < 0:
+                # keep a possible partial magic word at the end
+                self.discard(len(buffer) - len(MAGIC_WORD) + 1)
+                return False
+            self.discard(index)
+            if len(buffer) < HEADER.size:
+                return False
+            length = int.from_bytes(buffer[LENGTH_OFFSET:LENGTH_OFFSET + 4], 'little')
+            valid = HEADER.size <= length <= self.max_length
+            if valid and self.layout is not None and not self.layout_failed:
+                objects = int.from_bytes(buffer[OBJECTS_OFFSET:OBJECTS_OFFSET + 4], 'little')
+                if self.layout.check(length, objects):
+                    self.consecutive = 0
+                else:
+                    valid = False
+                    self.consecutive += 1
+                    if self.consecutive >= self.max_rejections:
+                        # the layout does not describe this stream, fall back to sane lengths
+                        self.layout_failed = True
+                        valid = True
+                        warnings.warn(f'{self.consecutive} frame headers in a row do not match the config layout '
+                                      f'(expected {self.layout.packet_length(objects)} bytes for {objects} objects, '
+                                      f'received {length}), length check disabled', RuntimeWarning)
+            if valid:
+                self.length = length
+            else:
+                # corrupt header, search for the next magic word
+                self.rejected += 1
+                self.discard(1)
+        return True
+
+    def next_frame(self):
+        """
+        Pops the next complete frame.
+
+        Returns:
+        - bytes | None - The frame starting with the magic word, None if incomplete.
+        """
+        if not self.sync() or len(self.buffer) < self.length:
+            return None
+        frame = bytes(self.buffer[:self.length])
+        del self.buffer[:self.length]
+        self.offset = self.position
+        self.position += self.length
+        self.length = 0
+        return frame
@@ -0,0 +1,194 @@
+import json
+import time
+from bisect import bisect_left
+from threading import Thread, Event
+
+"""
+Module for link-health and frame-drop instrumentation of the radar interface.
+
+Counters and fixed-bucket histograms are updated with a few integer operations
+per frame, snapshots are plain dicts that can be written as JSON lines.
+
+Classes:
+- Histogram:
+    Fixed bucket histogram with approximate percentiles.
+
+- LinkHealth:
+    Frame number gaps, resyncs, discarded bytes, data port throughput,
+    read/parse time per frame and the sensor stats TLV.
+
+- HealthReporter:
+    Thread writing a snapshot as one JSON line per interval.
+"""
+
+# bucket edges in ms for read/parse times
+TIME_EDGES = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# bucket edges in us for sensor processing times
+SENSOR_EDGES = (100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+class Histogram():
+    def __init__(self, edges : tuple = TIME_EDGES):
+        self.edges = edges
+        # last bucket counts values above the last edge
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value : float) -> None:
+        self.counts[bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max: self.max = value
+
+    def percentile(self, q : float) -> float:
+        # upper edge of the bucket containing the q-th percentile
+        if not self.count: return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.edges[i], self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count' : self.count,
+            'mean' : self.total / self.count if self.count else 0.0,
+            'p50' : self.percentile(50),
+            'p99' : self.percentile(99),
+            'max' : self.max
+        }
+
+class LinkHealth():
+    def __init__(self, stream = None):
+        """
+        Args:
+        - stream: FrameBuffer - Source of resync, discarded byte and rejected header counters.
+        """
+        self.stream = stream
+        self.start = time.time()
+        # frames
+        self.frames = 0
+        self.last_number = None
+        self.dropped_frames = 0
+        self.gaps = 0
+        self.restarts = 0
+        self.queue_dropped = 0
+        # data port
+        self.bytes = 0
+        # time per frame in ms
+        self.read_ms = Histogram()
+        self.parse_ms = Histogram()
+        # sensor stats tlv
+        self.sensor = {}
+        self.interframe_processing_us = Histogram(SENSOR_EDGES)
+        self.min_interframe_margin = None
+        self.max_active_load = 0
+
+    def read(self, nbytes : int) -> None:
+        # bytes read from the data port
+        self.bytes += nbytes
+
+    def frame(self, number : int, read_s : float, parse_s : float, stats = None) -> None:
+        """
+        Records one decoded frame.
+
+        Args:
+        - number: int - Frame number from the header.
+        - read_s: float - Seconds spent in read_frame.
+        - parse_s: float - Seconds spent in parse.
+        - stats: np.ndarray - Decoded stats tlv (decoder.STATS_DTYPE) or None.
+        """
+        self.frames += 1
+        if self.last_number is not None:
+            gap = number - self.last_number - 1
+            if gap > 0:
+                self.dropped_frames += gap
+                self.gaps += 1
+            elif gap < 0:
+                # sensor restarted or counter wrapped
+                self.restarts += 1
+        self.last_number = number
+        self.read_ms.record(read_s * 1000)
+        self.parse_ms.record(parse_s * 1000)
+        if stats is not None and len(stats):
+            ifpt, tot, ifpm, icpm, afpl, ifpl = stats[0].tolist()
+            self.sensor = {
+                'interframe_processing_us' : ifpt,
+                'transmit_output_us' : tot,
+                'interframe_margin_us' : ifpm,
+                'interchirp_margin_us' : icpm,
+                'active_frame_load' : afpl,
+                'interframe_load' : ifpl
+            }
+            self.interframe_processing_us.record(ifpt)
+            if self.min_interframe_margin is None or ifpm < self.min_interframe_margin:
+                self.min_interframe_margin = ifpm
+            if afpl > self.max_active_load: self.max_active_load = afpl
+
+    def snapshot(self, since : dict = None) -> dict:
+        """
+        Returns all counters, rates and histogram summaries without changing any state.
+
+        Args:
+        - since: dict - Earlier snapshot of the caller, rates are computed since then (default: since start).
+        """
+        now = time.time()
+        if since is None:
+            last, frames, nbytes = self.start, 0, 0
+        else:
+            last, frames, nbytes = since['time'], since['frames'], since['bytes']
+        elapsed = max(now - last, 1e-9)
+        stream = self.stream
+        return {
+            'time' : now,
+            'uptime' : now - self.start,
+            'frames' : self.frames,
+            'frames_per_s' : (self.frames - frames) / elapsed,
+            'bytes' : self.bytes,
+            'bytes_per_s' : (self.bytes - nbytes) / elapsed,
+            'dropped_frames' : self.dropped_frames,
+            'gaps' : self.gaps,
+            'restarts' : self.restarts,
+            'queue_dropped' : self.queue_dropped,
+            'resyncs' : stream.resyncs if stream is not None else 0,
+            'discarded_bytes' : stream.discarded if stream is not None else 0,
+            'rejected_headers' : stream.rejected if stream is not None else 0,
+            'read_ms' : self.read_ms.to_dict(),
+            'parse_ms' : self.parse_ms.to_dict(),
+            'sensor' : dict(self.sensor),
+            'interframe_processing_us' : self.interframe_processing_us.to_dict(),
+            'min_interframe_margin_us' : self.min_interframe_margin,
+            'max_active_load' : self.max_active_load
+        }
+
+class HealthReporter():
+    def __init__(self, health : LinkHealth, out, interval : float = 1.0):
+        """
+        Args:
+        - health: LinkHealth - Source of snapshots.
+        - out: str | file - Path (appended to) or open text stream for JSON lines.
+        - interval: float - Seconds between snapshots.
+        """
+        self.health = health
+        self.close_out = isinstance(out, str)
+        self.out = open(out, 'a') if self.close_out else out
+        self.interval = interval
+        self.stopped = Event()
+        self.thread = Thread(target = self._run, name = 'radar-health', daemon = True)
+        self.thread.start()
+
+    def _run(self):
+        # own rate window, other snapshot() callers do not affect it
+        previous = None
+        while not self.stopped.wait(self.interval):
+            previous = self.health.snapshot(previous)
+            self.out.write(json.dumps(previous) + '\n')
+            self.out.flush()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        if self.close_out: self.out.close()
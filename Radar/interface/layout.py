@@ -0,0 +1,88 @@
+from .radar_config import COMMANDS, parse_config, heatmap_shapes, tx_mask
+from .decoder import HEADER, TLV_HEADER, POINT_DTYPE, SIDE_INFO_DTYPE, STATS_DTYPE
+
+"""
+Expected frame layout of a radar config.
+
+Classes:
+- FrameLayout:
+    Derives range/doppler resolution, bin counts, frame period, the set of TLVs
+    enabled by guiMonitor, the byte size of each TLV and the total packet length
+    from the CLI commands of a config (COMMANDS or a .cfg file, see radar_config.load_cfg).
+"""
+
+# speed of light in m/s
+C = 299792458
+# total packet length is padded to a multiple of this
+SEGMENT = 32
+# temperature stats tlv sent along with stats (SDK 3.5+): valid flag, time, 10 sensors
+TEMPERATURE_SIZE = 4 + 4 + 10 * 2
+
+class FrameLayout():
+    def __init__(self, commands : list = COMMANDS):
+        config = parse_config(commands)
+        profile = config['profileCfg'][0]
+        frame = config['frameCfg'][0]
+        monitor = config['guiMonitor'][0]
+        shapes = heatmap_shapes(config = config)
+        # bins
+        self.range_bins, self.azimuth_antennas = shapes['azimuth_static']
+        self.doppler_bins = shapes['range_doppler'][1]
+        self.shapes = shapes
+        self.adc_samples = int(profile[9])
+        # chirp parameters: start GHz, idle us, ramp end us, slope MHz/us, sample rate ksps
+        start_freq, idle_time, ramp_end, slope, sample_rate = profile[1], profile[2], profile[4], profile[7], profile[10]
+        num_tx = max(bin(tx_mask(config)).count('1'), 1)
+        # unit conversions
+        self.range_resolution = C * sample_rate * 1e3 / (2 * slope * 1e12 * self.adc_samples)
+        self.range_bin_size = C * sample_rate * 1e3 / (2 * slope * 1e12 * self.range_bins)
+        self.max_range = C * sample_rate * 1e3 / (2 * slope * 1e12)
+        self.doppler_resolution = C / (2 * start_freq * 1e9 * (idle_time + ramp_end) * 1e-6 * self.doppler_bins * num_tx)
+        self.max_velocity = self.doppler_resolution * self.doppler_bins / 2
+        self.frame_period = frame[4] / 1000
+        # tlvs enabled by guiMonitor: points, range profile, noise profile, heatmaps, stats
+        self.points = int(monitor[1]) > 0
+        self.side_info = int(monitor[1]) == 1
+        self.sizes = {}
+        if int(monitor[2]): self.sizes[2] = 2 * self.range_bins
+        if int(monitor[3]): self.sizes[3] = 2 * self.range_bins
+        if int(monitor[4]): self.sizes[4] = 4 * self.range_bins * self.azimuth_antennas
+        if int(monitor[5]): self.sizes[5] = 2 * self.range_bins * self.doppler_bins
+        if int(monitor[6]): self.sizes[6] = STATS_DTYPE.itemsize
+        self.tlvs = set(self.sizes) | ({1} if self.points else set()) | ({7} if self.side_info else set())
+        # fixed part of the packet, points are added per object
+        self.fixed = HEADER.size + sum(TLV_HEADER.size + size for size in self.sizes.values())
+        self.per_object = (POINT_DTYPE.itemsize if self.points else 0) + (SIDE_INFO_DTYPE.itemsize if self.side_info else 0)
+        self.object_tlvs = TLV_HEADER.size * (int(self.points) + int(self.side_info))
+
+    def packet_length(self, objects : int, temperature : bool = False) -> int:
+        """
+        Total packet length for a frame with the given number of detected objects.
+
+        Args:
+        - objects: int - Number of detected objects in the header.
+        - temperature: bool - If True, includes the temperature stats tlv.
+
+        Returns:
+        - int - Length including padding.
+        """
+        length = self.fixed
+        if objects:
+            # point tlvs are only sent if something was detected
+            length += self.object_tlvs + objects * self.per_object
+        if temperature:
+            length += TLV_HEADER.size + TEMPERATURE_SIZE
+        return -(-length // SEGMENT) * SEGMENT
+
+    def check(self, length : int, objects : int) -> bool:
+        """
+        Checks the header length field against the layout in O(1).
+        """
+        if length == self.packet_length(objects):
+            return True
+        return 6 in self.sizes and length == self.packet_length(objects, temperature = True)
+
+    def __repr__(self) -> str:
+        return (f'FrameLayout(range_bins={self.range_bins}, doppler_bins={self.doppler_bins}, '
+                f'range_resolution={self.range_resolution:.3f} m, doppler_resolution={self.doppler_resolution:.3f} m/s, '
+                f'frame_period={self.frame_period} s, tlvs={sorted(self.tlvs)})')
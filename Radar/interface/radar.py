@@ -1,262 +1,296 @@
 from serial import Serial
-from struct import unpack
-from .radar_config import stop_radar, config_radar, baudrate_data
-from .utility import intify, q_to_db
+from threading import Thread, Event
+from queue import Queue, Full, Empty
+from time import perf_counter
+from .radar_config import stop_radar, config_radar, baudrate_data, load_cfg, COMMANDS, RadarConfigError
+from .decoder import FrameDecoder, to_dict
+from .frame import PointCloudFrame
+from .framing import FrameBuffer, MAGIC_WORD
+from .capture import Recorder, ReplaySerial
+from .layout import FrameLayout
+from .health import LinkHealth, HealthReporter
 
 """
 Main class for interface
 
 TODO:
-- increase sync speed (check for last 8 instead of reading in chunks?)
-- increase processing speed (process parallel to reading, tricky)
 - adjust output data format for specific needs
 
-Suggested changes:
+Config:
+- cfg (optional): TI .cfg file, default is radar_config.COMMANDS
+- layout: FrameLayout of the config, used to validate header lengths and shape heatmaps
+- com['conf_state'] (optional): state file, an unchanged config is not uploaded again
+- config_timing: (command, seconds) of the last upload
 
-- implement sliding window search for magic word
+Output:
+- as_dict = False: PointCloudFrame with numpy columns (see frame.py)
+- as_dict = True: legacy dict format ('i,i' keyed points, profiles as lists)
 
-- streamline parsing process: 
-    pre-determining the size and structure of each block type based on the header 
-    can allow for more targeted parsing without inspecting each byte individually
+Health:
+- health: LinkHealth with frame gaps, resyncs, throughput, read/parse times and sensor stats
+- health.snapshot() returns all counters, report(path) writes them periodically as JSON lines
 
-- use Struct for Binary Data:
-    instead of manually slicing and converting bytes, use the struct module more 
-    extensively to unpack data based on expected formats
+Streaming:
+- start() spawns a reader thread draining the data port and a parser thread,
+  frames() yields the decoded frames in order, stop() ends both threads
+- policy decides what happens if a queue is full:
+  'drop_oldest' discards the oldest frame, 'block' waits for the consumer
+  (after stop() at most one timeout per frame, frames it gives up on count as dropped)
+- streaming also ends if the reader fails, frames() and __call__() then return at once
 """
 
 class Radar():
-    def __init__(self, com : dict):
-        # connect config ports
-        self.conf = Serial(com['conf_port'], baudrate = com['conf_baud'], timeout = com['conf_to'])
-        # configurate sensor
-        baudrate_data(self.conf)
-        config_radar(self.conf, start = True)
-        # connect to data port
-        self.data = Serial(com['data_port'], baudrate = com['data_baud'])
+    def __init__(self, com : dict = None, as_dict : bool = False, data = None, cfg : str = None):
+        # commands and expected frame layout
+        self.commands = COMMANDS if cfg is None else load_cfg(cfg)
+        self.layout = FrameLayout(self.commands)
+        if data is None:
+            # connect config ports
+            self.conf = Serial(com['conf_port'], baudrate = com['conf_baud'], timeout = com['conf_to'])
+            # configurate sensor, replies are read until Done instead of timeouts
+            baudrate_data(self.conf, fast = True)
+            self.config_timing = config_radar(self.conf, start = True, fast = True, state = com.get('conf_state'), commands = self.commands)
+            # connect to data port
+            self.data = Serial(com['data_port'], baudrate = com['data_baud'])
+        else:
+            # serial stand-in (e.g. ReplaySerial), no sensor to configure
+            self.conf = None
+            self.data = data
+            self.config_timing = []
         # sync word
-        self.magic_word = b'\x02\x01\x04\x03\x06\x05\x08\x07'
-        # tracks sync of uart
-        self.sync = False
-        # buffer for bytestream
+        self.magic_word = MAGIC_WORD
+        # splits bytestream into frames, the layout is only known for sure if we configured the sensor
+        self.stream = FrameBuffer(layout = self.layout if data is None or cfg is not None else None)
+        # last complete frame
         self.input = {'buffer' : b''}
-        # ?
+        # last decoded frame
         self.output = {}
-        # chunk size for reading bytestream
-        self.size = 32
+        # decoder for tlv frames
+        self.decoder = FrameDecoder(self.layout.shapes)
+        # convert output to legacy dict format
+        self.as_dict = as_dict
         # dict for tlv types
-        self.indices={
-            1: 'detected_points', 
-            2: 'range_profile', 
-            3: 'noise_profile',
-            4: 'azimuth_static', 
-            5: 'range_doppler', 
-            6: 'stats', 
-            7: 'side_info'
-        }
+        self.indices = self.decoder.indices
+        # streaming mode
+        self.running = Event()
+        # set by the parser when the last frame is queued
+        self.finished = Event()
+        self.threads = []
+        self.raw = None
+        self.queue = None
+        self.policy = 'drop_oldest'
+        # link health counters
+        self.health = LinkHealth(self.stream)
+        self.reporter = None
+        # raw capture of the data port
+        self.recorder = None
+        self.closed = False
+
+    @property
+    def dropped(self) -> int:
+        # frames discarded because a queue was full
+        return self.health.queue_dropped
+
+    def report(self, out = None, interval : float = 1.0):
+        """
+        Writes health snapshots as JSON lines to out (path or text stream) every interval, None stops.
+        """
+        if self.reporter is not None:
+            self.reporter.stop()
+            self.reporter = None
+        if out is not None:
+            self.reporter = HealthReporter(self.health, out, interval)
+        return self.reporter
+
+    @classmethod
+    def replay(cls, path : str, speed : float = 1.0, as_dict : bool = False, cfg : str = None):
+        # radar fed from a capture written by record(), cfg enables layout checks
+        return cls(as_dict = as_dict, data = ReplaySerial(path, speed), cfg = cfg)
+
+    def record(self, path : str = None):
+        """
+        Starts recording the raw data port stream to path (and path.idx), None stops.
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if path is not None:
+            self.recorder = Recorder(path, base = self.stream.position)
+            # bytes that are already buffered belong to the capture
+            self.recorder.write(self.stream.buffer)
+        return self.recorder
 
     def has_data(self):
         return self.data.inWaiting() > 0
 
     def __del__(self):
         # stop radar and close serial ports on destruction
-        stop_radar(self.conf)
-        self.conf.close()
+        self.close()
+
+    def close(self):
+        # stop streaming and radar, close serial ports (only once)
+        if getattr(self, 'closed', True): return
+        self.closed = True
+        self.stop()
+        self.record(None)
+        self.report(None)
+        if self.conf is not None:
+            try:
+                stop_radar(self.conf, fast = True)
+            except RadarConfigError as e:
+                print(e)
+            self.conf.close()
         self.data.close()
 
-    def read_uart(self):
-        # read one data frame
+    def read_frame(self) -> bytes:
+        # read until one complete frame is buffered
         while True:
-            # TODO: check for last 8 instead, seems to take too long to sync
-            dat = self.data.read(self.size)
-            self.input['buffer'] += dat
-            # check for magic word
-            if dat[:len(self.magic_word)] == self.magic_word:
-                if not self.sync:
-                    # reset when new frame starts
-                    self.input['buffer'] = dat
-                    self.output = {}
-                    self.sync = True
-                else: break
-        self.sync = False
-        # check if something is in buffer
-        if len(self.input['buffer']) > 0: 
-            # remove magic word
-            self.input['buffer'] = self.input['buffer'][:-32]
-            # process frame
-            self.parse()
-        else:
-            # if nothing is in buffer try again 
-            self.read_uart()
+            frame = self._next_frame()
+            if frame is not None: return frame
+            self._fill()
+
+    def _fill(self):
+        # read the rest of the packet at once, drain everything that is waiting
+        dat = self.data.read(max(self.stream.missing(), self.data.in_waiting))
+        if self.recorder is not None: self.recorder.write(dat)
+        self.health.read(len(dat))
+        self.stream.feed(dat)
+
+    def _next_frame(self):
+        # pop next complete frame and add it to the capture index
+        frame = self.stream.next_frame()
+        if frame is not None and self.recorder is not None:
+            self.recorder.mark(self.stream.offset, frame)
+        return frame
+
+    def read_uart(self):
+        # read and process one data frame
+        start = perf_counter()
+        self.input['buffer'] = self.read_frame()
+        self.parse(read_time = perf_counter() - start)
     
-    def parse(self):
-        buffer = self.input['buffer']
-        address = 0
+    def parse(self, buffer = None, read_time : float = 0.0):
+        # decode frame into numpy views
+        start = perf_counter()
+        if buffer is None: buffer = self.input['buffer']
+        output = self.decoder(buffer)
+        # optional compatibility layer
+        self.output = to_dict(output) if self.as_dict else PointCloudFrame.from_decoded(output)
+        self.health.frame(output['header']['number'], read_time, perf_counter() - start, output.get('stats'))
+        return self.output
 
-        def head(dat, n = 40):
-            """
-            Extract header meta data from buffer
-            """
-            return n, \
-            {
-                'magic' : dat[:8],
-                'version' : intify(dat[8:12], 10),
-                'length' : int.from_bytes(dat[12:16],'little'),
-                'platform' : intify(dat[16:20], 10),
-                'number' : int.from_bytes(dat[20:24],'little'),
-                'time' : int.from_bytes(dat[24:28],'little'),
-                'objects' :  int.from_bytes(dat[28:32],'little'),
-                'blocks' : int.from_bytes(dat[32:36],'little'),
-                'subframe' : int.from_bytes(dat[36:n],'little')
-            }
-        
-        def structure(data, n = 8):
-            """
-            Check structure of TLV Packet
-            """
-            t = int.from_bytes(data[:4], 'little')
-            l = int.from_bytes(data[4:n], 'little')
-            # t = intify(data[:4])
-            # l = intify(data[4:n])
-            return n, t, l
+    def start(self, maxsize : int = 8, policy : str = 'drop_oldest', timeout : float = 0.1):
+        """
+        Starts streaming mode.
 
-        def progress(n, block, value):
-            nonlocal buffer, values, address
-            buffer = buffer[n:]
-            values -= n
-            if values == 0: address = 0
-            try: 
-                self.output[block].append(value)
-            except:
-                try:
-                    self.output[block][value[0]] = value[1]
-                except:
-                    self.output[block] = value
+        Args:
+        - maxsize: int - Capacity of the raw and decoded frame queues.
+        - policy: str - 'drop_oldest' or 'block' when a queue is full.
+        - timeout: float - Read timeout of the data port, bounds the time stop() waits.
+        """
+        if policy not in ('drop_oldest', 'block'):
+            raise ValueError(f'Unknown queue policy: {policy}')
+        if self.running.is_set(): return
+        # threads of a stream that ended on its own
+        self.stop()
+        self.finished.clear()
+        self.policy = policy
+        self.raw = Queue(maxsize)
+        self.queue = Queue(maxsize)
+        # heatmap buffers must outlive every queued frame
+        self.decoder.pool = 2 * maxsize + 2
+        # reader thread must wake up regularly to check for stop()
+        self.data.timeout = timeout
+        self.running.set()
+        self.threads = [
+            Thread(target = self._reader, name = 'radar-reader', daemon = True),
+            Thread(target = self._parser, name = 'radar-parser', daemon = True)
+        ]
+        for thread in self.threads:
+            thread.start()
 
-        def det_object(data, n = 16):
-            # convert from bytes to float
-            x = unpack('f',data[0:4])[0]
-            y = unpack('f',data[4:8])[0]
-            z = unpack('f',data[8:12])[0]
-            p = unpack('f',data[12:n])[0]
-            """
-            x = intify(data[:4])
-            y = intify(data[4:8])
-            z = intify(data[8:12])
-            p = intify(data[12:16])
-            if x > 32767: x -= 65536
-            if y > 32767: y -= 65536
-            if z > 32767: z -= 65536
-            qfrac = 0
-            if 'qfrac' in oth: qfrac = oth['qfrac']
-            x = q_to_dec(x, qfrac)
-            y = q_to_dec(y, qfrac)
-            z = q_to_dec(z, qfrac)
-            """
-            return n, p, x, y, z
-        
-        def profile(data, n = 2):
-            v = int.from_bytes(data[:n], 'little')
-            # v = intify(data[:n])
-            return n,v
-        
-        def heatmap(data, sgn, n = 2):
-            if sgn: v = int.from_bytes(data[:n], 'little', signed = True)
-            else: v = int.from_bytes(data[:n], 'little')
-            # v = intify(data[:n])
-            # if sgn and v > 32767: v -= 65536
-            return n,v
-        
-        def info(data, n = 24):
-            ifpt = int.from_bytes(data[:4], 'little')
-            tot = int.from_bytes(data[4:8], 'little')
-            ifpm = int.from_bytes(data[8:12], 'little')
-            icpm = int.from_bytes(data[12:16], 'little')
-            afpl = int.from_bytes(data[16:20], 'little')
-            ifpl = int.from_bytes(data[20:n], 'little')
-            # ifpt = intify(data[:4])
-            # tot  = intify(data[4:8])
-            # ifpm = intify(data[8:12])
-            # icpm = intify(data[12:16])
-            # afpl = intify(data[16:20])
-            # ifpl = intify(data[20:n])
-            return n, ifpt, tot, ifpm, icpm, afpl, ifpl
-        
-        def side_info(data, n = 4):
-            snr = int.from_bytes(data[:2], 'little')
-            noise = int.from_bytes(data[2:n], 'little')
-            # snr = intify(data[:2])
-            # noise = intify(data[2:n])
-            return n, snr, noise
-        
-        # process header 
-        n, self.output['header'] = head(buffer)
-        buffer = buffer[n:]
-        blocks = self.output['header']['blocks']
-        
-        for block in range(blocks):
-            # 0) get block type and length
-            if address == 0:
-                n, address, values = structure(buffer)
-                buffer = buffer[n:]
-                blocks -= 1
-                if address in (1, 7):
-                    self.output[self.indices[address]] = {}
-                elif address in (2,3,4,5):
-                    self.output[self.indices[address]] = []
-                elif address in (6,):
-                    self.output[self.indices[address]] = None
-            
-            # 1) point cloud
-            if address == 1:
-                for i in range(self.output['header']['objects']):
-                    n, p, x, y, z = det_object(buffer)
-                    progress(n, self.indices[address], (f'{i},{i}', {'v' : p, 'x' : x, 'y' : y, 'z' : z}))
+    def stop(self):
+        # end streaming mode, frames() returns after the last queued frame
+        if not self.threads: return
+        self.running.clear()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
 
-            # 2) log mag range fft
-            if address == 2:
-                while values > 0:
-                    n, v = profile(buffer)
-                    progress(n, self.indices[address], q_to_db(v))
+    def frames(self):
+        # yield decoded frames in order until streaming ends, later calls return at once
+        if self.queue is None: return
+        while True:
+            try:
+                frame = self.queue.get_nowait() if self.finished.is_set() else self.queue.get(timeout = 0.1)
+            except Empty:
+                # 'block' gives up on the end marker if nobody empties the queue
+                if self.finished.is_set() and self.queue.empty(): return
+                continue
+            if frame is None: return
+            yield frame
 
-            # 3) noise array
-            if address == 3:
-                while values > 0:
-                    n, v = profile(buffer)
-                    progress(n, self.indices[address], q_to_db(v))
+    def _put(self, queue : Queue, item, force : bool = False):
+        # put item according to policy, end markers of 'drop_oldest' always get in
+        if self.policy == 'block':
+            # wait for the consumer, after stop() only one more timeout
+            while True:
+                try:
+                    queue.put(item, timeout = self.data.timeout)
+                    return
+                except Full:
+                    if not self.running.is_set(): break
+            # a missing end marker is covered by finished
+            if not force: self.health.queue_dropped += 1
+            return
+        while True:
+            try:
+                queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    queue.get_nowait()
+                    self.health.queue_dropped += 1
+                except Empty:
+                    pass
 
-            # 4) range-azimuth heatmap
-            if address == 4:
-                while values > 0:
-                    n, v = heatmap(buffer, True)
-                    progress(n, self.indices[address], v)
+    def _reader(self):
+        # drain data port continuously, only complete frames are queued
+        try:
+            start = perf_counter()
+            while self.running.is_set():
+                frame = self._next_frame()
+                if frame is None:
+                    self._fill()
+                else:
+                    self._put(self.raw, (frame, perf_counter() - start))
+                    start = perf_counter()
+        finally:
+            # also if reading failed, the stream is over either way
+            self.running.clear()
+            self._put(self.raw, None, force = True)
 
-            # 5) range-doppler heatmap
-            if address == 5:
-                while values > 0:
-                    n, v = heatmap(buffer, True)
-                    progress(n, self.indices[address], v)
+    def _parser(self):
+        # decode raw frames in order
+        try:
+            reader = self.threads[0]
+            while True:
+                try:
+                    item = self.raw.get(timeout = 0.1)
+                except Empty:
+                    # 'block' gives up on the end marker if the parser is stuck, so watch the reader
+                    if reader.is_alive() or not self.raw.empty(): continue
+                    break
+                if item is None: break
+                self._put(self.queue, self.parse(*item))
+        finally:
+            self._put(self.queue, None, force = True)
+            self.finished.set()
 
-            # 6) statistics
-            if address == 6:
-                n, ifpt, tot, ifpm, icpm, afpl, ifpl = info(buffer)
-                progress(n, self.indices[address], {
-                    'interframe_processing' : ifpt,
-                    'transmit_output': tot,
-                    'processing_margin': {
-                        'interframe': ifpm,
-                        'interchirp': icpm},
-                    'cpu_load': {
-                        'active_frame': afpl,
-                        'interframe': ifpl}
-                })
-            
-            # 7) detected points side info
-            if address == 7:
-                for i in range(self.output['header']['objects']):
-                    n, snr, noise = side_info(buffer)
-                    progress(n, self.indices[address], (f'{i},{i}', {'snr' : snr, 'noise' : noise}))
-                             
     def __call__(self):
+        # next frame from stream in streaming mode, None once it ended
+        if self.threads:
+            return next(self.frames(), None)
         # generate new output
         self.read_uart()
         return self.output
@@ -0,0 +1,137 @@
+import time
+import pickle
+import multiprocessing as mp
+from queue import Full, Empty
+from threading import Thread
+from .radar import Radar
+
+"""
+Manager for several radar sensors, each running in its own process.
+
+Every worker process owns one Radar in streaming mode (reader and parser thread),
+so parsing of different sensors runs on different cores instead of sharing the GIL.
+Frames of all sensors are merged into one queue as (sensor id, host time, frame).
+A worker that fails sends its exception instead of the end marker, frames() records it
+in errors and raises it, calling frames() again continues with the other sensors.
+
+Usage:
+    with RadarArray([com_front, com_left]) as radars:
+        for sensor, stamp, frame in radars.frames():
+            ...
+"""
+
+def _worker(sensor, com : dict, kwargs : dict, queue, stop):
+    # runs in the worker process: stream frames until stop is set
+    radar = None
+    error = None
+    try:
+        if 'replay' in com:
+            # capture instead of a sensor, e.g. for profiling
+            radar = Radar.replay(com['replay'], com.get('speed', 1.0), **kwargs)
+        else:
+            radar = Radar(com, **kwargs)
+        radar.start()
+        # end frames() as soon as the manager asks to stop
+        Thread(target = lambda: (stop.wait(), radar.stop()), daemon = True).start()
+        for frame in radar.frames():
+            try:
+                queue.put_nowait((sensor, time.time(), frame))
+            except Full:
+                # consumer too slow, drop the frame of this sensor
+                pass
+    except Exception as e:
+        error = e
+    finally:
+        if radar is not None:
+            # stop_radar and close ports
+            radar.close()
+        if error is not None:
+            try:
+                pickle.loads(pickle.dumps(error))
+            except Exception:
+                # the queue pickles in a background thread, the manager unpickles, a failure would lose the marker
+                error = RuntimeError(repr(error))
+        # end marker for this sensor, the exception if it failed
+        queue.put((sensor, time.time(), error))
+
+class RadarArray():
+    def __init__(self, coms : list, maxsize : int = 64, **kwargs):
+        """
+        Args:
+        - coms: list - One com dict per sensor, optional key 'id' names the sensor (default: index),
+                       {'replay': path, 'speed': 1.0} replays a capture instead.
+        - maxsize: int - Capacity of the merged frame queue.
+        - kwargs: dict - Passed to every Radar (e.g. cfg, as_dict).
+        """
+        self.coms = coms
+        self.ids = [com.get('id', i) for i, com in enumerate(coms)]
+        self.kwargs = kwargs
+        self.queue = mp.Queue(maxsize)
+        self.stop_events = []
+        self.processes = []
+        self.running = set()
+        # sensor id -> exception of failed workers
+        self.errors = {}
+
+    def start(self):
+        # spawn one worker process per sensor
+        for sensor, com in zip(self.ids, self.coms):
+            stop = mp.Event()
+            process = mp.Process(target = _worker, args = (sensor, com, self.kwargs, self.queue, stop),
+                                 name = f'radar-{sensor}', daemon = True)
+            process.start()
+            self.stop_events.append(stop)
+            self.processes.append(process)
+            self.running.add(sensor)
+
+    def frames(self):
+        """
+        Yields (sensor id, host time, frame) of all sensors until every worker has ended.
+
+        Raises:
+        - Exception: The error of a failed worker, also kept in errors[sensor id].
+        """
+        while self.running:
+            try:
+                sensor, stamp, frame = self.queue.get(timeout = 0.5)
+            except Empty:
+                # worker died without end marker
+                for s, p in zip(self.ids, self.processes):
+                    if s in self.running and not p.is_alive():
+                        self.running.discard(s)
+                        if p.exitcode: self.errors[s] = RuntimeError(f'Radar {s} exited with code {p.exitcode}')
+                continue
+            if frame is None:
+                self.running.discard(sensor)
+                continue
+            if isinstance(frame, BaseException):
+                self.running.discard(sensor)
+                self.errors[sensor] = frame
+                raise frame
+            yield sensor, stamp, frame
+
+    def stop(self, timeout : float = 5.0):
+        # ask workers to stop the sensors, then wait for them
+        for stop in self.stop_events:
+            stop.set()
+        deadline = time.time() + timeout
+        for process in self.processes:
+            # keep draining so workers are not blocked on a full queue
+            while process.is_alive() and time.time() < deadline:
+                try:
+                    self.queue.get(timeout = 0.1)
+                except Empty:
+                    pass
+            process.join(max(deadline - time.time(), 0))
+            if process.is_alive():
+                process.terminate()
+        self.stop_events = []
+        self.processes = []
+        self.running = set()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
@@ -1,3 +1,7 @@
+import os
+import json
+import hashlib
+from time import perf_counter
 from serial import Serial
 
 """
@@ -5,17 +9,35 @@ Module for configuring radar.
 
 This module provides functions to configure and control a radar sensor using a serial connection.
 
-TODO:
-- apply parametrized cfg instead of MWE
+Constants:
+- COMMANDS: list[bytes] - CLI commands of the default configuration, ending with sensorStart.
+
+Fast mode (fast = True):
+    Instead of waiting for the read timeout after every command, each reply is read
+    until its 'Done'/'Error' line or the 'mmwDemo:/>' prompt. Errors raise
+    RadarConfigError naming the failing command. With a state file, an unchanged
+    config is not uploaded again, the sensor is only restarted with 'sensorStart 0'.
 
 Functions:
+- load_cfg(path: str) -> list:
+    Reads the commands of a TI .cfg file (as saved by the mmWave Demo Visualizer).
+
 - read_until_empty(conf: Serial, verbose: bool = False) -> None:
     Reads lines from the serial connection until an empty line is encountered.
 
 - baudrate_data(conf: Serial) -> None:
     Configures the data UART baudrate for the radar sensor.
 
-- config_radar(conf: Serial, start: bool = False) -> None:
+- read_reply(conf: Serial, timeout: float = 1.0, verbose: bool = False) -> list:
+    Reads the reply to one command until Done, Error or the prompt.
+
+- send_command(conf: Serial, command: bytes, timeout: float = 1.0, verbose: bool = False) -> list:
+    Sends one command and raises RadarConfigError if the sensor reports an error.
+
+- upload_config(conf: Serial, commands: list = COMMANDS, timeout: float = 1.0, verbose: bool = False) -> list:
+    Sends all commands in fast mode, returns (command, seconds) per command.
+
+- config_radar(conf: Serial, start: bool = False, fast: bool = False, state: str = None, commands: list = COMMANDS) -> list:
     Configures the radar sensor with the desired parameters.
     If 'start' is True, the sensor is started after configuration.
 
@@ -27,8 +49,93 @@ Functions:
 - stop_radar(conf: Serial, verbose: bool = True) -> None:
     Stops the radar sensor.
     If 'verbose' is True, the function prints the received lines from the sensor.
+
+- parse_config(commands: list = COMMANDS) -> dict:
+    Splits CLI commands into name and numeric arguments.
+
+- tx_mask(config: dict) -> int:
+    Tx antennas used by the chirps of the frame (parsed config).
+
+- heatmap_shapes(commands: list = COMMANDS, config: dict = None) -> dict:
+    Shapes of the range-azimuth and range-doppler heatmaps implied by the config.
 """
 
+# List of commands to configure the radar
+COMMANDS = [
+    b'sensorStop\n',
+    b'flushCfg\n',
+    b'dfeDataOutputMode 1\n',
+    b'channelCfg 15 7 0\n',
+    b'adcCfg 2 1\n',
+    b'adcbufCfg -1 0 1 1 1\n',
+    b'profileCfg 0 60 975 7 57.14 0 0 70 1 256 5209 0 0 158\n',
+    b'chirpCfg 0 0 0 0 0 0 0 1\n',
+    b'frameCfg 0 0 16 0 100 1 0\n',
+    b'lowPower 0 0\n',
+    b'guiMonitor -1 1 1 0 0 0 0\n',
+    b'cfarCfg -1 0 2 8 4 3 0 15 1\n',
+    b'cfarCfg -1 1 0 4 2 3 1 15 1\n',
+    b'multiObjBeamForming -1 1 0.5\n',
+    b'clutterRemoval -1 0\n',
+    b'calibDcRangeSig -1 0 -5 8 256\n',
+    b'extendedMaxVelocity -1 0\n',
+    b'lvdsStreamCfg -1 0 0 0\n',
+    b'compRangeBiasAndRxChanPhase 0.0 1 0 -1 0 1 0 -1 0 1 0 -1 0 1 0 -1 0 1 0 -1 0 1 0 -1 0\n',
+    b'measureRangeBiasAndRxChanPhase 0 1.5 0.2\n',
+    b'CQRxSatMonitor 0 3 5 121 0\n',
+    b'CQSigImgMonitor 0 127 4\n',
+    b'analogMonitor 0 0\n',
+    b'aoaFovCfg -1 -90 90 -90 90\n',
+    b'cfarFovCfg -1 0 0 8.92\n',
+    b'cfarFovCfg -1 1 -1.21 1.21\n',
+    b'calibData 0 0 0\n',
+    b'sensorStart\n'
+]
+
+# prompt of the mmWave demo CLI
+PROMPT = b'mmwDemo:/>'
+
+class RadarConfigError(RuntimeError):
+    def __init__(self, command: bytes, lines: list):
+        self.command = command.strip().decode(errors='replace')
+        self.lines = lines
+        super().__init__(f"'{self.command}' failed: {b' | '.join(lines).decode(errors='replace')}")
+
+    def __reduce__(self):
+        # picklable, e.g. to pass it from a RadarArray worker to the manager
+        return (type(self), (self.command.encode(), self.lines))
+
+def reply_status(line: bytes):
+    """
+    Classifies one reply line of the CLI.
+
+    Returns:
+    - str | None - 'done', 'error' or None for any other line.
+    """
+    if line.startswith(b'Done'):
+        return 'done'
+    if b'Error' in line or b'not recognized' in line:
+        return 'error'
+    return None
+
+def load_cfg(path: str) -> list:
+    """
+    Reads the commands of a TI .cfg file, '%' starts a comment.
+
+    Args:
+    - path: str - Path to the .cfg file.
+
+    Returns:
+    - list - CLI commands as bytes terminated with newline.
+    """
+    commands = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('%', 1)[0].strip()
+            if line:
+                commands.append(line.encode() + b'\n')
+    return commands
+
 def read_until_empty(conf: Serial, verbose: bool = False) -> None:
     """
     Reads lines from the serial connection until an empty line is encountered.
@@ -47,76 +154,160 @@ def read_until_empty(conf: Serial, verbose: bool = False) -> None:
         if verbose:
             print(line)
 
-def baudrate_data(conf: Serial) -> None:
+def read_reply(conf: Serial, timeout: float = 1.0, verbose: bool = False) -> list:
+    """
+    Reads the reply to one command until a Done or Error line or the prompt.
+
+    Args:
+    - conf: Serial - The serial connection object.
+    - timeout: float - Maximum time to wait for the end of the reply.
+    - verbose: bool - If True, prints the received lines.
+
+    Returns:
+    - list - Received lines without line endings.
+    """
+    lines = []
+    buffer = bytearray()
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        buffer += conf.read(conf.in_waiting or 1)
+        *complete, rest = buffer.split(b'\n')
+        buffer = bytearray(rest)
+        for line in complete:
+            line = line.strip()
+            if not line: continue
+            if verbose: print(line)
+            lines.append(line)
+            if reply_status(line) is not None:
+                return lines
+        # prompt after the echo, no Done line (e.g. unknown commands on some firmwares)
+        if lines and PROMPT in buffer:
+            return lines
+    return lines
+
+def send_command(conf: Serial, command: bytes, timeout: float = 1.0, verbose: bool = False) -> list:
+    """
+    Sends one command and waits for its reply.
+
+    Args:
+    - conf: Serial - The serial connection object.
+    - command: bytes - Command terminated with newline.
+    - timeout: float - Maximum time to wait for the reply.
+    - verbose: bool - If True, prints the received lines.
+
+    Returns:
+    - list - Received lines.
+    """
+    # drop the prompt and leftovers of earlier commands
+    conf.reset_input_buffer()
+    conf.write(command)
+    lines = read_reply(conf, timeout, verbose)
+    if any(reply_status(line) == 'error' for line in lines):
+        raise RadarConfigError(command, lines)
+    if not lines:
+        raise RadarConfigError(command, [b'no reply'])
+    return lines
+
+def upload_config(conf: Serial, commands: list = COMMANDS, timeout: float = 1.0, verbose: bool = False) -> list:
+    """
+    Sends all commands in fast mode, fails on the first error.
+
+    Args:
+    - conf: Serial - The serial connection object.
+    - commands: list - CLI commands as bytes.
+    - timeout: float - Maximum time to wait for each reply.
+    - verbose: bool - If True, prints the timing of each command.
+
+    Returns:
+    - list - (command, seconds) for each command.
+    """
+    timing = []
+    for command in commands:
+        start = perf_counter()
+        send_command(conf, command, timeout)
+        timing.append((command.strip().decode(), perf_counter() - start))
+        if verbose:
+            print(f'{timing[-1][1] * 1000:8.1f} ms  {timing[-1][0]}')
+    return timing
+
+def config_hash(commands: list = COMMANDS) -> str:
+    # identifies a config in the state file
+    return hashlib.sha1(b''.join(command.strip() + b'\n' for command in commands)).hexdigest()
+
+def baudrate_data(conf: Serial, fast: bool = False) -> None:
     """
     Configures the data UART baudrate for the radar sensor.
 
     Args:
     - conf: Serial - The serial connection object.
+    - fast: bool - If True, waits for the reply instead of the read timeout.
 
     Returns:
     - None
     """
     # Config for data UART
+    if fast:
+        send_command(conf, b'configDataPort 921600 1\n')
+        return
     conf.write(b'configDataPort 921600 1\n')
     read_until_empty(conf)
 
-def config_radar(conf: Serial, start: bool = False) -> None:
+def config_radar(conf: Serial, start: bool = False, fast: bool = False, state: str = None, verbose: bool = False,
+                 commands: list = COMMANDS) -> list:
     """
     Configures the radar sensor with the desired parameters.
 
     Args:
     - conf: Serial - The serial connection object.
     - start: bool - If True, starts the sensor after configuration.
+    - fast: bool - If True, reads replies until Done/prompt and fails fast on errors.
+    - state: str - JSON file remembering the last uploaded config per port (fast mode only).
+    - verbose: bool - If True, prints the timing of each command (fast mode only).
+    - commands: list - CLI commands, e.g. from load_cfg.
 
     Returns:
-    - None
+    - list - (command, seconds) per command in fast mode, else None.
     """
-    # Stop sensor before configuration
-    stop_radar(conf, verbose=False)
-
-    # List of commands to configure the radar
-    commands = [
-        b'sensorStop\n',
-        b'flushCfg\n',
-        b'dfeDataOutputMode 1\n',
-        b'channelCfg 15 7 0\n',
-        b'adcCfg 2 1\n',
-        b'adcbufCfg -1 0 1 1 1\n',
-        b'profileCfg 0 60 975 7 57.14 0 0 70 1 256 5209 0 0 158\n',
-        b'chirpCfg 0 0 0 0 0 0 0 1\n',
-        b'frameCfg 0 0 16 0 100 1 0\n',
-        b'lowPower 0 0\n',
-        b'guiMonitor -1 1 1 0 0 0 0\n',
-        b'cfarCfg -1 0 2 8 4 3 0 15 1\n',
-        b'cfarCfg -1 1 0 4 2 3 1 15 1\n',
-        b'multiObjBeamForming -1 1 0.5\n',
-        b'clutterRemoval -1 0\n',
-        b'calibDcRangeSig -1 0 -5 8 256\n',
-        b'extendedMaxVelocity -1 0\n',
-        b'lvdsStreamCfg -1 0 0 0\n',
-        b'compRangeBiasAndRxChanPhase 0.0 1 0 -1 0 1 0 -1 0 1 0 -1 0 1 0 -1 0 1 0 -1 0 1 0 -1 0\n',
-        b'measureRangeBiasAndRxChanPhase 0 1.5 0.2\n',
-        b'CQRxSatMonitor 0 3 5 121 0\n',
-        b'CQSigImgMonitor 0 127 4\n',
-        b'analogMonitor 0 0\n',
-        b'aoaFovCfg -1 -90 90 -90 90\n',
-        b'cfarFovCfg -1 0 0 8.92\n',
-        b'cfarFovCfg -1 1 -1.21 1.21\n',
-        b'calibData 0 0 0\n',
-        b'sensorStart\n'
-    ]
-
-    
-    # Execute each command in sequence
-    for command in commands:
-        read_until_empty(conf)
-        conf.write(command)
+    if not fast:
+        # Stop sensor before configuration
+        stop_radar(conf, verbose=False)
 
+        # Execute each command in sequence
+        for command in commands:
+            read_until_empty(conf)
+            conf.write(command)
+
+        if start:
+            start_radar(conf, full_config=True)
+        return None
+
+    # skip upload if the sensor still holds this config
+    digest = config_hash(commands)
+    known = {}
+    if state is not None and os.path.exists(state):
+        with open(state) as f:
+            known = json.load(f)
+    if known.get(conf.port) == digest and start:
+        try:
+            begin = perf_counter()
+            send_command(conf, b'sensorStop\n')
+            send_command(conf, b'sensorStart 0\n')
+            return [('sensorStart 0', perf_counter() - begin)]
+        except RadarConfigError:
+            # sensor was reset, upload again
+            pass
+
+    # start separately, so the state is only stored for a complete config
+    timing = upload_config(conf, [command for command in commands if not command.startswith(b'sensorStart')], verbose=verbose)
+    if state is not None:
+        known[conf.port] = digest
+        with open(state, 'w') as f:
+            json.dump(known, f, indent=3)
     if start:
-        start_radar(conf, full_config=True)
+        timing += upload_config(conf, [b'sensorStart\n'], verbose=verbose)
+    return timing
 
-def start_radar(conf: Serial, full_config: bool = False, verbose: bool = True) -> None:
+def start_radar(conf: Serial, full_config: bool = False, verbose: bool = True, fast: bool = False) -> None:
     """
     Starts the radar sensor.
 
@@ -124,32 +315,104 @@ def start_radar(conf: Serial, full_config: bool = False, verbose: bool = True) -
     - conf: Serial - The serial connection object.
     - full_config: bool - If True, starts the sensor with full configuration.
     - verbose: bool - If True, prints the received lines.
+    - fast: bool - If True, waits for the reply instead of the read timeout.
 
     Returns:
     - None
     """
     # Start sensor
+    if fast:
+        send_command(conf, b'sensorStart\n' if full_config else b'sensorStart 0\n', verbose=verbose)
+        return
     if full_config:
         conf.write(b'sensorStart\n')
     else:
         conf.write(b'sensorStart 0\n')
     read_until_empty(conf, verbose=verbose)
 
-def stop_radar(conf: Serial, verbose: bool = True) -> None:
+def stop_radar(conf: Serial, verbose: bool = True, fast: bool = False) -> None:
     """
     Stops the radar sensor.
 
     Args:
     - conf: Serial - The serial connection object.
     - verbose: bool - If True, prints the received lines.
+    - fast: bool - If True, waits for the reply instead of the read timeout.
 
     Returns:
     - None
     """
     # Stop radar
+    if fast:
+        send_command(conf, b'sensorStop\n', verbose=verbose)
+        return
     conf.write(b'sensorStop\n')
     read_until_empty(conf, verbose=verbose)
 
+def parse_config(commands: list = COMMANDS) -> dict:
+    """
+    Splits CLI commands into name and numeric arguments.
+
+    Args:
+    - commands: list - CLI commands as bytes.
+
+    Returns:
+    - dict - Command name -> list of argument lists (commands like chirpCfg can repeat).
+    """
+    config = {}
+    for command in commands:
+        name, *args = command.decode().split()
+        config.setdefault(name, []).append([float(arg) for arg in args])
+    return config
+
+def tx_mask(config: dict) -> int:
+    """
+    Tx antennas of all chirps between the first and last chirp of frameCfg.
+
+    Args:
+    - config: dict - Parsed config, see parse_config.
+
+    Returns:
+    - int - Bit mask of the tx antennas.
+    """
+    chirp_start, chirp_end = (int(v) for v in config['frameCfg'][0][:2])
+    mask = 0
+    for chirp in config.get('chirpCfg', []):
+        if int(chirp[1]) >= chirp_start and int(chirp[0]) <= chirp_end:
+            mask |= int(chirp[7])
+    return mask
+
+def heatmap_shapes(commands: list = COMMANDS, config: dict = None) -> dict:
+    """
+    Shapes of the range-azimuth and range-doppler heatmaps implied by
+    channelCfg, profileCfg, chirpCfg and frameCfg (xwr68xx demo conventions).
+
+    Args:
+    - commands: list - CLI commands as bytes.
+    - config: dict - Already parsed commands (parse_config), used instead of commands.
+
+    Returns:
+    - dict - 'azimuth_static': (range bins, virtual azimuth antennas),
+             'range_doppler': (range bins, doppler bins)
+    """
+    if config is None: config = parse_config(commands)
+    rx_mask = int(config['channelCfg'][0][0])
+    adc_samples = int(config['profileCfg'][0][9])
+    chirp_start, chirp_end, loops = (int(v) for v in config['frameCfg'][0][:3])
+    tx = tx_mask(config)
+    num_rx = bin(rx_mask).count('1')
+    num_tx = max(bin(tx).count('1'), 1)
+    # tx1 and tx3 are azimuth antennas, tx2 is elevation
+    num_tx_azim = max(bin(tx & 0b101).count('1'), 1)
+    # fft sizes are rounded up to powers of two
+    range_bins = 1 << (adc_samples - 1).bit_length()
+    doppler_chirps = (chirp_end - chirp_start + 1) * loops // num_tx
+    doppler_bins = 1 << (max(doppler_chirps, 1) - 1).bit_length()
+    return {
+        'azimuth_static': (range_bins, num_tx_azim * num_rx),
+        'range_doppler': (range_bins, doppler_bins)
+    }
+
 if __name__ == '__main__':
     # test: configurate radar
     conf = Serial('COM4', baudrate = 115200, timeout=0.1)
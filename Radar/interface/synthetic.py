@@ -0,0 +1,97 @@
+import numpy as np
+from .decoder import HEADER, TLV_HEADER, POINT_DTYPE, SIDE_INFO_DTYPE, STATS_DTYPE
+from .framing import MAGIC_WORD
+
+"""
+Generator for synthetic frames in the mmWave SDK 3.6 UART format.
+
+Frames contain valid headers and TLVs for all seven types of Radar.indices with
+random payloads, so parser and reader can be benchmarked without a sensor.
+
+Functions:
+- synthetic_frame(number: int = 0, points: int = 32, ...) -> bytes:
+    Builds one packet with the requested shape.
+
+- synthetic_stream(frames: int, junk: int = 0, ...) -> bytes:
+    Concatenates frames, optionally with garbage in between to exercise resync.
+"""
+
+# total packet length is padded to a multiple of this
+SEGMENT = 32
+# version 3.6.0.0 and platform xwr68xx as bcd
+VERSION = 0x03060000
+PLATFORM = 0x000a6843
+
+def synthetic_frame(number : int = 0, points : int = 32, range_bins : int = 256, doppler_bins : int = 16,
+                    azimuth_antennas : int = 4, blocks : tuple = (1, 2, 3, 4, 5, 6, 7), time : int = 0,
+                    rng : np.random.Generator = None) -> bytes:
+    """
+    Builds one packet.
+
+    Args:
+    - number: int - Frame number in the header.
+    - points: int - Detected points (tlv 1 and 7).
+    - range_bins: int - Length of range/noise profile, rows of the heatmaps.
+    - doppler_bins: int - Columns of the range-doppler heatmap.
+    - azimuth_antennas: int - Virtual antennas of the range-azimuth heatmap.
+    - blocks: tuple - TLV types to include.
+    - time: int - CPU cycle timestamp in the header.
+    - rng: np.random.Generator - Source of random payloads.
+
+    Returns:
+    - bytes - Complete frame including padding.
+    """
+    rng = np.random.default_rng(number) if rng is None else rng
+    payloads = []
+    for block in blocks:
+        if block == 1:
+            data = np.zeros(points, POINT_DTYPE)
+            data['x'] = rng.uniform(-5, 5, points)
+            data['y'] = rng.uniform(0, 10, points)
+            data['z'] = rng.uniform(-2, 2, points)
+            data['v'] = rng.uniform(-3, 3, points)
+        elif block in (2, 3):
+            data = rng.integers(0, 1 << 15, range_bins, dtype = np.uint16)
+        elif block == 4:
+            data = rng.integers(-1 << 12, 1 << 12, range_bins * azimuth_antennas * 2, dtype = np.int16)
+        elif block == 5:
+            data = rng.integers(0, 1 << 15, range_bins * doppler_bins, dtype = np.uint16)
+        elif block == 6:
+            data = np.zeros(1, STATS_DTYPE)
+            data['interframe_processing'] = rng.integers(1000, 5000)
+            data['interframe_margin'] = rng.integers(10000, 90000)
+            data['active_frame_load'] = rng.integers(0, 100)
+            data['interframe_load'] = rng.integers(0, 100)
+        elif block == 7:
+            data = np.zeros(points, SIDE_INFO_DTYPE)
+            data['snr'] = rng.integers(0, 1000, points)
+            data['noise'] = rng.integers(0, 2000, points)
+        else:
+            raise ValueError(f'Unknown TLV type: {block}')
+        payload = data.tobytes()
+        payloads.append(TLV_HEADER.pack(block, len(payload)) + payload)
+    body = b''.join(payloads)
+    length = -(-(HEADER.size + len(body)) // SEGMENT) * SEGMENT
+    header = HEADER.pack(MAGIC_WORD, VERSION, length, PLATFORM, number, time, points, len(blocks), 0)
+    return (header + body).ljust(length, b'\x0f')
+
+def synthetic_stream(frames : int, junk : int = 0, start : int = 0, seed : int = 0, **shape) -> bytes:
+    """
+    Builds a bytestream of consecutive frames.
+
+    Args:
+    - frames: int - Number of frames.
+    - junk: int - Random bytes inserted before every frame.
+    - start: int - Number of the first frame.
+    - seed: int - Seed for payloads and junk.
+    - shape: dict - Keyword arguments for synthetic_frame.
+
+    Returns:
+    - bytes - The stream.
+    """
+    rng = np.random.default_rng(seed)
+    stream = bytearray()
+    for number in range(start, start + frames):
+        if junk: stream += rng.integers(0, 256, junk, dtype = np.uint8).tobytes()
+        stream += synthetic_frame(number, time = (number * 60000000) & 0xffffffff, rng = rng, **shape)
+    return bytes(stream)
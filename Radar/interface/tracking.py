@@ -0,0 +1,229 @@
+import numpy as np
+
+"""
+Multi-target tracking of radar detections.
+
+All tracks share stacked arrays: state (T, 6) with x, y, z, vx, vy, vz and covariance (T, 6, 6),
+so prediction, gating and the (extended) Kalman update are batched NumPy operations.
+Measurements are positions plus the Doppler radial velocity v, which is the projection
+of the track velocity onto the line of sight and is linearized per track.
+
+Detections are gated with the Mahalanobis distance of the position and assigned with the
+Hungarian algorithm (scipy, if installed) or greedily by cost. Unassigned detections start
+tentative tracks, tracks are confirmed after n_init hits and deleted after max_misses misses.
+
+Classes:
+- Tracker:
+    Constant-velocity Kalman tracker, update() takes the detections of one frame.
+"""
+
+# chi-square 99% quantile for 3 degrees of freedom
+GATE_3D = 11.34
+
+def _assign(cost : np.ndarray) -> tuple:
+    # minimum cost assignment, entries of inf are never assigned
+    finite = np.isfinite(cost)
+    if not finite.any():
+        empty = np.empty(0, dtype = np.intp)
+        return empty, empty
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        linear_sum_assignment = None
+    if linear_sum_assignment is not None:
+        # gated pairs get a cost that is never preferred over leaving both unassigned
+        big = cost[finite].max() * 2 + 1
+        rows, cols = linear_sum_assignment(np.where(finite, cost, big))
+        keep = finite[rows, cols]
+        return rows[keep], cols[keep]
+    # greedy: cheapest pairs first
+    rows, cols = np.nonzero(finite)
+    order = np.argsort(cost[rows, cols], kind = 'stable')
+    used_rows, used_cols = set(), set()
+    pick = []
+    for k in order.tolist():
+        r, c = rows[k], cols[k]
+        if r in used_rows or c in used_cols: continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pick.append(k)
+    pick = np.array(pick, dtype = np.intp)
+    return rows[pick], cols[pick]
+
+class Tracker():
+    def __init__(self, dt : float = 0.1, position_std : float = 0.15, doppler_std : float = 0.1, accel_std : float = 2.0,
+                 gate : float = GATE_3D, n_init : int = 3, max_misses : int = 5, init_velocity_std : float = 2.0):
+        """
+        Args:
+        - dt: float - Default time between frames in s (frameCfg period, see FrameLayout.frame_period).
+        - position_std: float - Measurement noise of x, y, z in m.
+        - doppler_std: float - Measurement noise of the Doppler velocity in m/s.
+        - accel_std: float - Process noise as white acceleration in m/s^2.
+        - gate: float - Largest squared Mahalanobis distance of an assignment.
+        - n_init: int - Hits until a track is confirmed.
+        - max_misses: int - Frames without detection until a track is deleted.
+        - init_velocity_std: float - Velocity uncertainty of new tracks perpendicular to the line of sight.
+        """
+        self.dt = dt
+        self.R = np.diag([position_std ** 2] * 3 + [doppler_std ** 2])
+        self.accel_std = accel_std
+        self.gate = gate
+        self.n_init = n_init
+        self.max_misses = max_misses
+        self.init_velocity_std = init_velocity_std
+        # stacked track arrays
+        self.state = np.zeros((0, 6))
+        self.covariance = np.zeros((0, 6, 6))
+        self.ids = np.zeros(0, dtype = np.int64)
+        self.hits = np.zeros(0, dtype = np.int64)
+        self.misses = np.zeros(0, dtype = np.int64)
+        self.next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _motion(self, dt : float) -> tuple:
+        # transition and process noise of the constant velocity model
+        F = np.eye(6)
+        F[:3, 3:] = np.eye(3) * dt
+        q = self.accel_std ** 2
+        Q = np.zeros((6, 6))
+        Q[:3, :3] = np.eye(3) * q * dt ** 4 / 4
+        Q[:3, 3:] = Q[3:, :3] = np.eye(3) * q * dt ** 3 / 2
+        Q[3:, 3:] = np.eye(3) * q * dt ** 2
+        return F, Q
+
+    def predict(self, dt : float = None) -> None:
+        """
+        Propagates all tracks by dt (default: self.dt).
+        """
+        F, Q = self._motion(self.dt if dt is None else dt)
+        self.state = self.state @ F.T
+        self.covariance = F @ self.covariance @ F.T + Q
+
+    def _measure(self, state : np.ndarray) -> tuple:
+        # predicted measurement (x, y, z, v) and jacobian for each state
+        p, vel = state[:, :3], state[:, 3:]
+        r = np.maximum(np.linalg.norm(p, axis = 1), 1e-6)
+        u = p / r[:, None]
+        radial = np.einsum('ij,ij->i', u, vel)
+        H = np.zeros((len(state), 4, 6))
+        H[:, :3, :3] = np.eye(3)
+        H[:, 3, :3] = (vel - radial[:, None] * u) / r[:, None]
+        H[:, 3, 3:] = u
+        return np.column_stack((p, radial)), H
+
+    def _spawn(self, positions : np.ndarray, doppler : np.ndarray, has_doppler : bool = True) -> None:
+        # new tentative tracks, velocity along the line of sight from Doppler
+        n = len(positions)
+        if not n: return
+        r = np.maximum(np.linalg.norm(positions, axis = 1), 1e-6)
+        u = positions / r[:, None]
+        state = np.hstack((positions, u * doppler[:, None]))
+        covariance = np.zeros((n, 6, 6))
+        covariance[:, :3, :3] = self.R[:3, :3]
+        if has_doppler:
+            # doppler fixes the radial component, the rest is unknown
+            radial = np.einsum('ni,nj->nij', u, u)
+            covariance[:, 3:, 3:] = self.init_velocity_std ** 2 * (np.eye(3) - radial) + self.R[3, 3] * radial
+        else:
+            # no velocity information at all
+            covariance[:, 3:, 3:] = self.init_velocity_std ** 2 * np.eye(3)
+        self.state = np.vstack((self.state, state))
+        self.covariance = np.concatenate((self.covariance, covariance))
+        self.ids = np.concatenate((self.ids, np.arange(self.next_id, self.next_id + n)))
+        self.hits = np.concatenate((self.hits, np.ones(n, dtype = np.int64)))
+        self.misses = np.concatenate((self.misses, np.zeros(n, dtype = np.int64)))
+        self.next_id += n
+
+    def update(self, positions : np.ndarray, doppler : np.ndarray = None, dt : float = None) -> dict:
+        """
+        Predicts all tracks and updates them with the detections of one frame.
+
+        Args:
+        - positions: np.ndarray - (N, 3) detections x, y, z in m (points or cluster centroids).
+        - doppler: np.ndarray - (N,) radial velocities in m/s, None if not available.
+        - dt: float - Time since the previous frame in s, default self.dt.
+
+        Returns:
+        - dict - Confirmed tracks, see tracks().
+        """
+        positions = np.asarray(positions, dtype = np.float64).reshape(-1, 3)
+        has_doppler = doppler is not None
+        doppler = np.asarray(doppler, dtype = np.float64) if has_doppler else np.zeros(len(positions))
+        self.predict(dt)
+        tracks, detections = np.empty(0, dtype = np.intp), np.empty(0, dtype = np.intp)
+        if len(self) and len(positions):
+            # position gating for all (track, detection) pairs
+            S = self.covariance[:, :3, :3] + self.R[:3, :3]
+            S_inv = np.linalg.inv(S)
+            d = positions[None, :, :] - self.state[:, None, :3]
+            cost = np.einsum('tni,tij,tnj->tn', d, S_inv, d)
+            cost[cost > self.gate] = np.inf
+            tracks, detections = _assign(cost)
+        if len(tracks):
+            self._correct(tracks, positions[detections], doppler[detections], has_doppler)
+        # bookkeeping
+        assigned = np.zeros(len(self), dtype = bool)
+        assigned[tracks] = True
+        self.hits[assigned] += 1
+        self.misses[assigned] = 0
+        self.misses[~assigned] += 1
+        keep = self.misses <= self.max_misses
+        # tentative tracks are dropped at the first miss
+        keep &= (self.hits >= self.n_init) | (self.misses == 0)
+        self._select(keep)
+        unassigned = np.ones(len(positions), dtype = bool)
+        unassigned[detections] = False
+        self._spawn(positions[unassigned], doppler[unassigned], has_doppler)
+        return self.tracks()
+
+    def _correct(self, tracks : np.ndarray, positions : np.ndarray, doppler : np.ndarray, has_doppler : bool) -> None:
+        # batched extended kalman update of the assigned tracks
+        x, P = self.state[tracks], self.covariance[tracks]
+        predicted, H = self._measure(x)
+        z = np.column_stack((positions, doppler))
+        if not has_doppler:
+            # position only
+            predicted, H, z = predicted[:, :3], H[:, :3], z[:, :3]
+            R = self.R[:3, :3]
+        else:
+            R = self.R
+        y = z - predicted
+        PHt = P @ H.transpose(0, 2, 1)
+        S = H @ PHt + R
+        K = PHt @ np.linalg.inv(S)
+        self.state[tracks] = x + np.einsum('tij,tj->ti', K, y)
+        self.covariance[tracks] = (np.eye(6) - K @ H) @ P
+
+    def _select(self, keep : np.ndarray) -> None:
+        self.state = self.state[keep]
+        self.covariance = self.covariance[keep]
+        self.ids = self.ids[keep]
+        self.hits = self.hits[keep]
+        self.misses = self.misses[keep]
+
+    def tracks(self, confirmed : bool = True) -> dict:
+        """
+        Returns the current tracks.
+
+        Args:
+        - confirmed: bool - If True, only tracks with at least n_init hits.
+
+        Returns:
+        - dict - 'id' (T,), 'position' (T, 3), 'velocity' (T, 3), 'hits' (T,), 'misses' (T,) arrays.
+        """
+        mask = self.hits >= self.n_init if confirmed else np.ones(len(self), dtype = bool)
+        return {
+            'id' : self.ids[mask],
+            'position' : self.state[mask, :3],
+            'velocity' : self.state[mask, 3:],
+            'hits' : self.hits[mask],
+            'misses' : self.misses[mask]
+        }
+
+    def __call__(self, frame, dt : float = None) -> dict:
+        """
+        Updates with all points of a PointCloudFrame (or anything with x, y, z, doppler columns).
+        """
+        return self.update(np.column_stack((frame.x, frame.y, frame.z)), frame.doppler, dt)
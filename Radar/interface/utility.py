@@ -1,9 +1,17 @@
+import numpy as np
+
 """
 Random functions needed in conversion of tlv packages
 
 copied from pymmw: https://github.com/m6c7l/pymmw/blob/master/source/lib/utility.py
+
+The *_array functions are vectorized versions for NumPy arrays of raw values,
+bcd is a fast path for the version/platform header fields.
 """
 
+# decimal value of each bcd byte (nibbles above 9 carry like in intify)
+BCD = tuple((b >> 4) * 10 + (b & 15) for b in range(256))
+
 def intify(value, base = 16, size = 2):
     if type(value) not in (tuple, list, bytes,):
         value = (value,)
@@ -17,3 +25,23 @@ def q_to_dec(value, n):
 
 def q_to_db(value):
     return q_to_dec(value, 9) * 6
+
+def intify_array(values, base = 16, size = 2):
+    # intify (bytes semantics) along the last axis of an array of byte values
+    values = np.asarray(values, dtype = np.int64)
+    if base != 16:
+        values = (values // 16) * base + values % 16
+    weights = (base ** size) ** np.arange(values.shape[-1], dtype = np.int64)
+    return values @ weights
+
+def bcd(value : int) -> int:
+    # same as intify(value.to_bytes(4, 'little'), 10) without the byte loop
+    return BCD[value & 0xff] + BCD[value >> 8 & 0xff] * 100 + BCD[value >> 16 & 0xff] * 10000 + BCD[value >> 24 & 0xff] * 1000000
+
+def q_to_dec_array(values, n, out = None):
+    # q_to_dec for arrays, optionally into a preallocated float array
+    return np.multiply(values, 1.0 / (1 << n), out = out, casting = 'unsafe')
+
+def q_to_db_array(values, out = None):
+    # q_to_db for arrays of raw Q9 values, optionally into a preallocated float array
+    return np.multiply(values, 6.0 / (1 << 9), out = out, casting = 'unsafe')
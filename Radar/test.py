@@ -1,4 +1,6 @@
 from interface.radar import Radar
+from interface.tracking import Tracker
+from interface.clustering import PointClusterer
 from time import time
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
@@ -59,6 +61,8 @@ for angle in range(0, 360, 10):
 # Initial scatter plots
 sc_3d = ax_3d.scatter([], [], [], c=[], marker='.')
 sc_2d = ax_2d.scatter([], [], c=[], marker='.')
+# confirmed tracks
+sc_tracks = ax_2d.scatter([], [], c='blue', marker='x')
 
 # Function to update the points on the scatter plots
 def update_plot():
@@ -100,21 +104,28 @@ if __name__ == '__main__':
         'data_baud': 921600
     }
     sensor = Radar(com)
+    # persistent objects instead of raw points
+    clusterer = PointClusterer(eps = 0.5, min_samples = 2)
+    tracker = Tracker(dt = sensor.layout.frame_period)
+    # read in background so plotting does not stall the uart
+    sensor.start()
 
     # test: reading a number of data packages
-    buffer = []
     data = {}
     try:
-        while True:
-            buffer.append(sensor())
-            data = buffer[-1]
+        for frame in sensor.frames():
+            # frames are not kept, their heatmaps are reused by the decoder
+            data = frame
 
-            # Loop over each detected point and extract the values
-            for key, point in data['detected_points'].items():
-                v.append(point['v'])
-                x.append(point['x'])
-                y.append(point['y'])
-                z.append(point['z'])
+            # append the point columns of the frame
+            v.extend(data.doppler)
+            x.extend(data.x)
+            y.extend(data.y)
+            z.extend(data.z)
+            # one detection per object
+            clusters = clusterer(data)
+            tracks = tracker.update(clusters['centroid'], clusters['doppler'])
+            sc_tracks.set_offsets(tracks['position'][:, :2])
                 
             colors = update_colors()  # Update color transparency
             update_plot()
@@ -123,3 +134,4 @@ if __name__ == '__main__':
                 break
     except KeyboardInterrupt:
         plt.close()  # Close the plot when interrupted
+    sensor.stop()
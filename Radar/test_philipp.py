@@ -16,6 +16,8 @@ com = {
     'data_baud': 921600
 }
 sensor = Radar(com)
+# read in background, sensor() returns the next queued frame
+sensor.start()
 
 # GUI setup
 window = tk.Tk()
@@ -57,11 +59,10 @@ def update_plot():
     while True:
         pause_event.wait()  # This will block when the event is cleared (paused)
         data = sensor()
-        detected_points = data['detected_points']
 
-        x_coords = [coords['x'] for coords in detected_points.values()]
-        y_coords = [coords['y'] for coords in detected_points.values()]
-        z_coords = [coords['z'] for coords in detected_points.values()]
+        x_coords = data.x
+        y_coords = data.y
+        z_coords = data.z
 
         
         ax.clear()